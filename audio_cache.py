@@ -0,0 +1,405 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import shlex
+from collections import OrderedDict
+
+import discord
+from discord.oggparse import OggStream
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from ffmpeg_supervisor import FFmpegCapacityError, FFmpegSupervisor, TimedSource, ffmpeg_executable
+
+# Reproducir los ficheros de la caché desde un mapa de memoria, sin proceso FFmpeg
+AUDIO_CACHE_MMAP = os.getenv("AUDIO_CACHE_MMAP", "1") != "0"
+
+OGG_MAGIC = b'OggS'
+OPUS_HEADER_PACKETS = 2  # OpusHead y OpusTags
+FRAMES_PER_SECOND = 50  # paquetes Opus de 20 ms
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read through a memory map"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+class StoreLockedError(Exception):
+    pass
+
+
+def lock_directory(directory):
+    """Take an exclusive lock on ``directory`` for this process; returns the open lock file"""
+    lock_file = open(os.path.join(directory, 'lock'), 'a+')
+    try:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock_file.close()
+        raise StoreLockedError(f"{directory} is already used by another process")
+    return lock_file
+
+
+def has_ogg_magic(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) == OGG_MAGIC
+    except OSError:
+        return False
+
+
+class OggMapReader(discord.AudioSource):
+    """Opus packets of an Ogg file, read straight from a memory map; ``start`` skips that many seconds"""
+
+    def __init__(self, path, start=0):
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.packets = OggStream(self.map).iter_packets()
+        if start:
+            # Conservar OpusHead y OpusTags y saltar los paquetes de audio anteriores a ``start``
+            headers = [next(self.packets, b'') for _ in range(OPUS_HEADER_PACKETS)]
+            for _ in range(int(start * FRAMES_PER_SECOND)):
+                if not next(self.packets, b''):
+                    break
+            self.packets = itertools.chain(headers, self.packets)
+
+    def read(self):
+        if self.map.closed:
+            return b''
+        return next(self.packets, b'')
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        if not self.map.closed:
+            self.map.close()
+
+
+class MappedOpusAudio(TimedSource, OggMapReader):
+    """A cached file played without an FFmpeg process or pipe; pages come from the OS page cache"""
+
+
+class AudioSegmentCache:
+    """Byte-budgeted, content-addressed on-disk store of Ogg/Opus files.
+
+    A track is only admitted after it has been played ``min_plays`` times,
+    so one-off songs never push out the popular ones; it is then downloaded
+    in the background (Opus streams are remuxed, anything else transcoded).
+    Files live under ``objects/`` named by the SHA-256 of their contents,
+    and ``index.json`` maps each song to its object, so the same audio
+    reached through different URLs is stored once. Eviction is LRU over
+    objects. Every object is checked against its hash, in a worker thread,
+    before it is first served after a start; until then a lookup is a miss,
+    and a corrupt or truncated file is dropped and counted instead of
+    played. The cache hands out file paths, never live audio sources, so
+    each hit gets a fresh source.
+
+    A directory belongs to one process at a time (it is locked on open and
+    cluster workers get one each), since the index is held in memory and
+    rewritten as a whole. Reading the directory back, which hashes files
+    left by the old ``<key>.ogg`` layout, happens in ``load()`` off the
+    event loop; until it finishes every lookup is a miss and nothing is
+    admitted.
+    """
+
+    def __init__(self, directory, max_bytes, min_plays=2, bitrate='128k', executable=None, supervisor=None):
+        self.directory = directory
+        self.objects_dir = os.path.join(directory, 'objects')
+        self.index_path = os.path.join(directory, 'index.json')
+        self.max_bytes = max_bytes
+        self.min_plays = min_plays
+        self.bitrate = bitrate
+        self.executable = executable
+        self.supervisor = supervisor or FFmpegSupervisor()  # Las descargas cuentan en su límite de procesos
+        self.objects = OrderedDict()  # digest -> tamaño en bytes, del menos al más usado
+        self.refs = {}  # clave de canción -> digest
+        self.verified = set()  # objetos cuyo hash ya se comprobó en este arranque
+        self.verifying = set()
+        self.play_counts = {}
+        self.pending = set()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        self.corrupt = 0
+        self.loaded = False
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.lock_file = lock_directory(directory)
+
+    async def load(self):
+        """Read back what is on disk in a worker thread, then verify it in the background"""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._scan)
+        except Exception as e:
+            print(f"Error loading audio cache: {e}")
+        self.loaded = True
+        self.verify_all()
+
+    def close(self):
+        """Release the directory for another process (or a reloaded cog)"""
+        if self.lock_file:
+            self.lock_file.close()
+            self.lock_file = None
+
+    def _scan(self):
+        """Recupera los objetos que ya estaban en disco, los más antiguos primero"""
+        # Descargas a medias de una ejecución que terminó de golpe
+        for name in os.listdir(self.directory):
+            if name.endswith('.part'):
+                self._remove(os.path.join(self.directory, name))
+
+        files = []
+        for prefix in os.listdir(self.objects_dir):
+            subdir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                path = os.path.join(subdir, name)
+                if not name.endswith('.ogg'):
+                    continue
+                if not has_ogg_magic(path):
+                    self.corrupt += 1
+                    self._remove(path)
+                    continue
+                stat = os.stat(path)
+                files.append((stat.st_atime, name[:-4], stat.st_size))
+        for _, digest, size in sorted(files):
+            self.objects[digest] = size
+            self.total_bytes += size
+
+        try:
+            with open(self.index_path) as f:
+                refs = json.load(f)
+        except (OSError, ValueError):
+            refs = {}
+        self.refs = {key: digest for key, digest in refs.items() if digest in self.objects}
+        self._migrate()
+        # Los objetos sin canción (un índice que no llegó a guardarse) no se borran aquí:
+        # siguen contando en el presupuesto y el LRU los desaloja los primeros
+        for digest in set(self.objects) - set(self.refs.values()):
+            self.objects.move_to_end(digest, last=False)
+        self._evict()
+        self._save_index()
+
+    def _migrate(self):
+        """Adopta los ficheros ``<clave>.ogg`` del formato anterior de la caché"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.ogg') or not os.path.isfile(path):
+                continue
+            if not has_ogg_magic(path):
+                self.corrupt += 1
+                self._remove(path)
+                continue
+            digest = file_digest(path)
+            if digest in self.objects:
+                self._remove(path)
+            else:
+                os.makedirs(os.path.dirname(self.path_for(digest)), exist_ok=True)
+                os.replace(path, self.path_for(digest))
+                size = os.path.getsize(self.path_for(digest))
+                self.objects[digest] = size
+                self.total_bytes += size
+            self.refs[name[:-4]] = digest
+            self.verified.add(digest)
+
+    def _save_index(self):
+        tmp_path = self.index_path + '.part'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.refs, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Error saving audio cache index: {e}")
+
+    @staticmethod
+    def key_for(song):
+        ident = song.webpage_url or song.url
+        return hashlib.sha1(ident.encode()).hexdigest()
+
+    def path_for(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.ogg")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # En Windows un fichero mapeado en memoria no se puede borrar mientras suena
+            print(f"Error removing cached audio {path}: {e}")
+
+    def _drop(self, digest):
+        """Forget an object and every song pointing at it, and delete its file"""
+        self.total_bytes -= self.objects.pop(digest, 0)
+        self.verified.discard(digest)
+        for key in [key for key, ref in self.refs.items() if ref == digest]:
+            del self.refs[key]
+        self._remove(self.path_for(digest))
+
+    def _check(self, digest, size):
+        """Size and hash check of an object; runs in a worker thread"""
+        path = self.path_for(digest)
+        try:
+            return os.path.getsize(path) == size and file_digest(path) == digest
+        except OSError:
+            return False
+
+    def _reject(self, digest):
+        # Borrado o modificado por fuera: no se reproduce
+        self.corrupt += 1
+        self._drop(digest)
+        self._save_index()
+
+    async def _verify(self, digest):
+        try:
+            ok = await asyncio.get_running_loop().run_in_executor(None, self._check, digest, self.objects[digest])
+            if digest not in self.objects:
+                return  # Desalojado mientras se comprobaba
+            if ok:
+                self.verified.add(digest)
+            else:
+                self._reject(digest)
+        except Exception as e:
+            print(f"Error verifying cached audio {digest}: {e}")
+        finally:
+            self.verifying.discard(digest)
+
+    def _schedule_verify(self, digest):
+        if digest not in self.verifying:
+            self.verifying.add(digest)
+            asyncio.get_running_loop().create_task(self._verify(digest))
+
+    def verify_all(self):
+        """Check every object not yet verified in the background, so the first plays can hit"""
+        for digest in list(self.objects):
+            if digest not in self.verified:
+                self._schedule_verify(digest)
+
+    def get(self, song):
+        """Return the cached file path for ``song`` or None"""
+        digest = self.refs.get(self.key_for(song)) if self.loaded else None
+        if digest is not None:
+            if digest not in self.verified:
+                self._schedule_verify(digest)  # Falla ahora; sirve en cuanto esté comprobado
+            elif os.path.exists(self.path_for(digest)):
+                self.objects.move_to_end(digest)
+                self.hits += 1
+                return self.path_for(digest)
+            else:
+                self._reject(digest)
+        self.misses += 1
+        return None
+
+    def record_play(self, song):
+        """Count a play and return True if the song should now be cached"""
+        key = self.key_for(song)
+        if not self.loaded or key in self.refs or key in self.pending:
+            return False
+        self.play_counts[key] = self.play_counts.get(key, 0) + 1
+        return self.play_counts[key] >= self.min_plays
+
+    async def store(self, song, stream_url, before_options='', copy=False):
+        """Download ``stream_url`` as Ogg/Opus in the background and admit it.
+
+        ``copy`` remuxes a stream that is already 48 kHz Opus instead of
+        transcoding it.
+        """
+        key = self.key_for(song)
+        if key in self.refs or key in self.pending:
+            return
+        self.pending.add(key)
+        tmp_path = os.path.join(self.directory, f"{key}.part")
+        codec = ['-c:a', 'copy'] if copy else ['-c:a', 'libopus', '-b:a', self.bitrate, '-ar', '48000', '-ac', '2']
+        try:
+            returncode = await self.supervisor.run_download(
+                self.executable or ffmpeg_executable(), '-y', *shlex.split(before_options or ''),
+                '-i', stream_url, '-vn', *codec, '-f', 'ogg', tmp_path,
+            )
+            if returncode != 0:
+                print(f"Error caching audio for {song.title}: ffmpeg exited with {returncode}")
+                return
+
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes or not has_ogg_magic(tmp_path):
+                return
+            digest = await asyncio.get_running_loop().run_in_executor(None, file_digest, tmp_path)
+            if digest in self.objects:
+                self.deduplicated += 1  # El mismo audio ya estaba guardado con otra URL
+            else:
+                os.makedirs(os.path.dirname(self.path_for(digest)), exist_ok=True)
+                os.replace(tmp_path, self.path_for(digest))
+                self.objects[digest] = size
+                self.total_bytes += size
+                self.stored += 1
+            self.objects.move_to_end(digest)
+            self.verified.add(digest)
+            self.refs[key] = digest
+            self.play_counts.pop(key, None)
+            self._evict()
+            self._save_index()
+        except FFmpegCapacityError:
+            pass  # Sin hueco libre: se vuelve a intentar en la próxima reproducción
+        except Exception as e:
+            print(f"Error caching audio for {song.title}: {e}")
+        finally:
+            self.pending.discard(key)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self.objects:
+            self._drop(next(iter(self.objects)))
+            self.evicted += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.refs),
+            'objects': len(self.objects),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'usage': self.total_bytes / self.max_bytes if self.max_bytes else 0.0,
+            'pending': len(self.pending),
+            'verifying': len(self.verifying),
+            'stored': self.stored,
+            'deduplicated': self.deduplicated,
+            'evicted': self.evicted,
+            'corrupt': self.corrupt,
+        }
+
+
+def audio_cache_from_env(supervisor=None):
+    """Crea la caché de audio con AUDIO_CACHE_DIR y AUDIO_CACHE_MAX_MB (0 la desactiva)"""
+    max_mb = int(os.getenv("AUDIO_CACHE_MAX_MB", "512"))
+    if max_mb <= 0:
+        return None
+    try:
+        return AudioSegmentCache(
+            os.getenv("AUDIO_CACHE_DIR", "audio_cache"),
+            max_mb * 1024 * 1024,
+            min_plays=int(os.getenv("AUDIO_CACHE_MIN_PLAYS", "2")),
+            supervisor=supervisor,
+        )
+    except StoreLockedError as e:
+        print(f"Audio cache disabled: {e}")
+        return None
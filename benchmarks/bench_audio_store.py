@@ -0,0 +1,66 @@
+"""Start-up time and CPU per play of a cached song: FFmpeg copy vs memory-mapped reads.
+
+Usage:
+    python benchmarks/bench_audio_store.py song.ogg [--plays 20]
+
+``song.ogg`` must be Ogg/Opus, like the files in the audio store (e.g.
+``ffmpeg -i song.webm -c:a copy song.ogg``). Each play builds a source the
+way ``MusicPlayer.build_source`` does for a cache hit and reads it to the
+end as fast as possible, reporting the time to the first packet and the
+CPU used by the bot and by FFmpeg.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_cache import MappedOpusAudio  # noqa: E402
+from ffmpeg_supervisor import FFmpegSupervisor, SupervisedOpusAudio  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+
+def cpu_times():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+
+def measure(name, make_source, plays):
+    first_packet = []
+    frames = 0
+    bot_before, ffmpeg_before = cpu_times()
+    started = time.perf_counter()
+    for _ in range(plays):
+        play_started = time.perf_counter()
+        source = make_source()
+        source.read()
+        first_packet.append(time.perf_counter() - play_started)
+        frames += 1
+        while source.read():
+            frames += 1
+        source.cleanup()
+    wall = time.perf_counter() - started
+    bot_after, ffmpeg_after = cpu_times()
+    ms = 1000
+    print(
+        f"{name:<8} plays={plays} frames={frames} wall={wall:6.2f}s "
+        f"first packet p50/p99={percentile(first_packet, 0.5) * ms:6.1f}/{percentile(first_packet, 0.99) * ms:6.1f}ms "
+        f"bot_cpu={bot_after - bot_before:6.3f}s ffmpeg_cpu={ffmpeg_after - ffmpeg_before:6.3f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached song playback: FFmpeg copy vs mmap")
+    parser.add_argument("path", help="Ogg/Opus file")
+    parser.add_argument("--plays", type=int, default=20)
+    args = parser.parse_args()
+
+    supervisor = FFmpegSupervisor()
+    measure("ffmpeg", lambda: SupervisedOpusAudio(args.path, codec='copy', supervisor=supervisor), args.plays)
+    measure("mmap", lambda: MappedOpusAudio(args.path), args.plays)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Event-loop lag and voice-send jitter with thread vs process extraction.
+
+Usage:
+    python benchmarks/bench_extractor_isolation.py [--jobs 40] [--workers 4]
+
+A synthetic extraction (pure-Python work that holds the GIL, like yt-dlp's
+signature deciphering and JSON parsing) is run ``--jobs`` times through
+ExtractorPool in each mode. Meanwhile the event loop is probed every 10 ms
+and a thread mimicking discord.py's AudioPlayer sends a "packet" every
+20 ms. The report shows how late those wake-ups are.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractor_pool import ExtractorPool  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+FRAME = 0.02  # discord.py envía un paquete Opus cada 20 ms
+
+
+def synthetic_extract(key, opts, target, enqueued_at):
+    started_at = time.time()
+    payload = json.dumps([{'itag': i, 'url': 'x' * 200, 'sig': list(range(50))} for i in range(2000)])
+    for _ in range(6):
+        formats = json.loads(payload)
+        signature = 0
+        for fmt in formats:
+            for value in fmt['sig']:
+                signature = (signature * 31 + value) % 1000003
+    record = {'id': target, 'url': f"https://example.invalid/{signature}", 'title': target}
+    return {'entries': [record]}, started_at - enqueued_at, time.time() - started_at
+
+
+def voice_sender(stop, jitter):
+    """Imita el bucle de AudioPlayer: dormir hasta el siguiente paquete de 20 ms"""
+    next_send = time.perf_counter()
+    while not stop.is_set():
+        next_send += FRAME
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        jitter.append(abs(time.perf_counter() - next_send))
+
+
+async def loop_probe(stop, lag):
+    while not stop.is_set():
+        expected = time.perf_counter() + 0.01
+        await asyncio.sleep(0.01)
+        lag.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_mode(mode, jobs, workers):
+    pool = ExtractorPool(workers, mode=mode, worker=synthetic_extract)
+    # Calentar los procesos para no medir el arranque
+    await asyncio.gather(*(pool.extract_info({}, f"warmup-{i}") for i in range(workers)))
+
+    stop = threading.Event()
+    lag, jitter = [], []
+    sender = threading.Thread(target=voice_sender, args=(stop, jitter), daemon=True)
+    sender.start()
+    probe = asyncio.create_task(loop_probe(stop, lag))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.extract_info({}, f"song-{i}") for i in range(jobs)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    sender.join()
+    pool.shutdown()
+
+    ms = 1000
+    print(
+        f"{mode:<8} jobs={jobs} elapsed={elapsed:6.2f}s | "
+        f"loop lag p50={percentile(lag, 0.5) * ms:6.1f}ms p99={percentile(lag, 0.99) * ms:6.1f}ms "
+        f"max={max(lag, default=0) * ms:6.1f}ms | "
+        f"voice jitter p50={percentile(jitter, 0.5) * ms:6.1f}ms p99={percentile(jitter, 0.99) * ms:6.1f}ms "
+        f"max={max(jitter, default=0) * ms:6.1f}ms"
+    )
+
+
+async def run(args):
+    for mode in ('thread', 'process'):
+        await run_mode(mode, args.jobs, args.workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag and voice jitter with thread vs process extraction")
+    parser.add_argument("--jobs", type=int, default=40, help="synthetic extractions per mode")
+    parser.add_argument("--workers", type=int, default=4, help="extractor threads or processes")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""GuildQueue vs deque for random-access queue operations.
+
+Usage:
+    python benchmarks/bench_guild_queue.py [--size 50000] [--operations 2000]
+
+Fills both structures with ``--size`` entries and times ``--operations``
+random removes, inserts, moves, index lookups and 10-entry page views at
+random positions.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guild_queue import GuildQueue  # noqa: E402
+
+
+def deque_ops():
+    def remove(queue, i):
+        del queue[i]
+
+    def insert(queue, i):
+        queue.insert(i, -1)
+
+    def move(queue, i, j):
+        value = queue[i]
+        del queue[i]
+        queue.insert(j, value)
+
+    def page(queue, i):
+        return [queue[k] for k in range(i, min(i + 10, len(queue)))]
+
+    return {'remove': remove, 'insert': insert, 'move': move, 'index': lambda q, i: q[i], 'page': page}
+
+
+def guild_queue_ops():
+    return {
+        'remove': lambda q, i: q.remove(i),
+        'insert': lambda q, i: q.insert(i, -1),
+        'move': lambda q, i, j: q.move(i, j),
+        'index': lambda q, i: q[i],
+        'page': lambda q, i: q.slice(i, i + 10),
+    }
+
+
+def run(label, queue, ops, operations, seed):
+    rng = random.Random(seed)
+    timings = {}
+    for name, op in ops.items():
+        started = time.perf_counter()
+        for _ in range(operations):
+            i = rng.randrange(len(queue))
+            if name == 'move':
+                op(queue, i, rng.randrange(len(queue)))
+            else:
+                op(queue, i)
+        timings[name] = (time.perf_counter() - started) / operations * 1e6
+    summary = " ".join(f"{name}={us:7.2f}us" for name, us in timings.items())
+    print(f"{label:<10} {summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GuildQueue vs deque for random-access queue operations")
+    parser.add_argument("--size", type=int, default=50000, help="entries in the queue")
+    parser.add_argument("--operations", type=int, default=2000, help="timed operations of each kind")
+    args = parser.parse_args()
+    size, operations = args.size, args.operations
+
+    started = time.perf_counter()
+    guild_queue = GuildQueue(range(size))
+    build = time.perf_counter() - started
+    started = time.perf_counter()
+    guild_queue.shuffle()
+    shuffle = time.perf_counter() - started
+    print(f"size={size} build={build * 1000:.1f}ms shuffle={shuffle * 1000:.1f}ms")
+
+    run("deque", deque(range(size)), deque_ops(), operations, 1)
+    run("GuildQueue", guild_queue, guild_queue_ops(), operations, 1)
+
+
+if __name__ == "__main__":
+    main()
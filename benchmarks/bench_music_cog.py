@@ -0,0 +1,132 @@
+"""Load test of the Music cog with fake voice, fake yt-dlp and the fake Spotify API.
+
+Usage:
+    python benchmarks/bench_music_cog.py [--guilds 50] [--songs 5] [--skips 3]
+        [--ytdl-latency 0.3] [--spotify-latency 0.05] [--track-seconds 1.0]
+
+Every simulated guild issues ``--songs`` ``!play`` searches, loads a
+Spotify playlist and skips ``--skips`` times, all guilds at once, through
+the real command callbacks of music.py. yt-dlp lookups sleep for
+``--ytdl-latency``, voice clients "play" each track for
+``--track-seconds`` and no FFmpeg process is started, so the run needs no
+network, Discord token or FFmpeg (it does need discord.py, yt-dlp and
+aiohttp installed). Reports command throughput, p50/p99 command latency,
+first-audio and transition latency, CPU time and peak memory.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Antes de importar music: nada en disco, sin caché de audio ni endpoint de métricas
+os.environ.update({
+    'AUDIO_CACHE_MAX_MB': '0',
+    'MAPPING_DB': '',
+    'STATE_BACKEND': 'memory',
+    'EXTRACTOR_MODE': 'thread',
+    'METRICS_PORT': '0',
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from extractor_pool import ExtractorPool, compact_info  # noqa: E402
+from fake_spotify import start_fake_spotify  # noqa: E402
+from fakes import FakeBot, FakeContext, FakeSource, FakeYoutubeDL  # noqa: E402
+from metrics import (  # noqa: E402
+    EXTRACTION_SECONDS, FIRST_AUDIO_SECONDS, TRACKS_PLAYED, TRANSITION_GAP_SECONDS, percentile,
+)
+from music import Music  # noqa: E402
+
+PLAYLIST_URL = "https://open.spotify.com/playlist/fake"
+
+
+def fake_worker(latency):
+    def worker(key, opts, target, enqueued_at):
+        started_at = time.time()
+        info = compact_info(FakeYoutubeDL(opts, latency).extract_info(target, download=False))
+        return info, started_at - enqueued_at, time.time() - started_at
+    return worker
+
+
+async def timed(latencies, name, coro):
+    started = time.perf_counter()
+    await coro
+    latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+
+async def simulate_guild(cog, guild, args, latencies):
+    ctx = FakeContext(guild)
+    for i in range(args.songs):
+        # Consultas repetidas entre servidores, como canciones populares
+        await timed(latencies, 'play', cog.play.callback(cog, ctx, query=f"song {i % args.unique} artist"))
+    await timed(latencies, 'playlist', cog.play.callback(cog, ctx, query=PLAYLIST_URL))
+    for _ in range(args.skips):
+        await asyncio.sleep(args.track_seconds / 2)
+        if guild.voice_client:
+            started = time.perf_counter()
+            guild.voice_client.stop()
+            latencies.setdefault('skip', []).append(time.perf_counter() - started)
+    await asyncio.sleep(args.track_seconds)
+    await cog.music_player.stop_and_disconnect(guild.id)
+
+
+async def run(args):
+    runner, app, base = await start_fake_spotify(track_count=args.playlist_tracks, latency=args.spotify_latency)
+    bot = FakeBot(asyncio.get_running_loop())
+    cog = Music(bot)
+    await cog.cog_load()
+
+    player = cog.music_player
+    player.extractor.shutdown()
+    player.extractor = ExtractorPool(mode='thread', worker=fake_worker(args.ytdl_latency))
+    player.build_source = lambda guild_id, song, spare=False: FakeSource(song, player.quality.tier(guild_id))
+    player.spotify.client_id, player.spotify.client_secret = "bench", "bench"
+    player.spotify.api_url, player.spotify.token_url = f"{base}/v1", f"{base}/api/token"
+
+    guilds = [bot.add_guild(guild_id, args.track_seconds) for guild_id in range(1, args.guilds + 1)]
+    latencies = {}
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    await asyncio.gather(*(simulate_guild(cog, guild, args, latencies) for guild in guilds))
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    commands_run = sum(len(values) for values in latencies.values())
+    ms = 1000
+    print(f"{args.guilds} guilds, {commands_run} commands in {elapsed:.2f}s ({commands_run / elapsed:.1f} commands/s)")
+    for name, values in latencies.items():
+        print(f"  {name:<9} n={len(values):5d}  p50={percentile(values, 0.5) * ms:8.1f}ms  p99={percentile(values, 0.99) * ms:8.1f}ms")
+    print(f"  tracks started: {TRACKS_PLAYED.value()}, "
+          f"first audio p50/p99 <= {FIRST_AUDIO_SECONDS.quantile(0.5) * ms:.0f}/{FIRST_AUDIO_SECONDS.quantile(0.99) * ms:.0f}ms, "
+          f"transition p50/p99 <= {TRANSITION_GAP_SECONDS.quantile(0.5) * ms:.0f}/{TRANSITION_GAP_SECONDS.quantile(0.99) * ms:.0f}ms")
+    print(f"  extractions: {EXTRACTION_SECONDS.count}, resolver cache {player.resolution_cache.stats()['hit_rate']:.0%} hits, "
+          f"spotify {app['requests']} requests")
+    peak = f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB" if resource else "n/a"
+    print(f"  CPU {cpu:.2f}s ({cpu / elapsed:.0%} of one core), peak RSS {peak}")
+
+    await cog.cog_unload()
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the Music cog")
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--songs", type=int, default=5, help="!play searches per guild")
+    parser.add_argument("--unique", type=int, default=20, help="distinct search queries shared by all guilds")
+    parser.add_argument("--skips", type=int, default=3)
+    parser.add_argument("--playlist-tracks", type=int, default=200)
+    parser.add_argument("--ytdl-latency", type=float, default=0.3, help="seconds per fake yt-dlp lookup")
+    parser.add_argument("--spotify-latency", type=float, default=0.05, help="seconds per fake Spotify response")
+    parser.add_argument("--track-seconds", type=float, default=1.0, help="how long each fake track plays")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
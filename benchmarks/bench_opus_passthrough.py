@@ -0,0 +1,91 @@
+"""CPU cost per stream: PCM decode + libopus re-encode vs Opus pass-through.
+
+Usage:
+    python benchmarks/bench_opus_passthrough.py <file-or-url> [seconds]
+
+The input should be an Opus/WebM file (e.g. one downloaded with
+``yt-dlp -f 251``). Both paths read the whole stream as fast as possible,
+the way discord.py's audio player would, and report CPU seconds used by
+the bot process and by FFmpeg per minute of audio.
+"""
+import resource
+import sys
+import time
+
+import discord
+from discord.opus import Encoder
+
+FRAME_SECONDS = Encoder.FRAME_LENGTH / 1000
+
+
+def cpu_times():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+
+def run_pcm(source_path, options):
+    """Ruta actual: FFmpeg decodifica a PCM y discord.py codifica a Opus"""
+    encoder = Encoder()
+    source = discord.FFmpegPCMAudio(source_path, options=options)
+    frames = 0
+    while True:
+        pcm = source.read()
+        if not pcm:
+            break
+        encoder.encode(pcm, Encoder.SAMPLES_PER_FRAME)
+        frames += 1
+    source.cleanup()
+    return frames
+
+
+def run_passthrough(source_path, options):
+    """Ruta nueva: FFmpeg copia los paquetes Opus sin tocarlos"""
+    source = discord.FFmpegOpusAudio(source_path, codec='copy', options=options)
+    frames = 0
+    while source.read():
+        frames += 1
+    source.cleanup()
+    return frames
+
+
+def measure(name, runner, source_path, options):
+    bot_before, ffmpeg_before = cpu_times()
+    started = time.perf_counter()
+    frames = runner(source_path, options)
+    wall = time.perf_counter() - started
+    bot_after, ffmpeg_after = cpu_times()
+
+    audio_minutes = frames * FRAME_SECONDS / 60 or float('inf')
+    bot_cpu = bot_after - bot_before
+    ffmpeg_cpu = ffmpeg_after - ffmpeg_before
+    print(
+        f"{name:<12} frames={frames:<7} wall={wall:6.2f}s "
+        f"bot_cpu={bot_cpu / audio_minutes:6.3f}s/min "
+        f"ffmpeg_cpu={ffmpeg_cpu / audio_minutes:6.3f}s/min "
+        f"total={(bot_cpu + ffmpeg_cpu) / audio_minutes:6.3f}s/min"
+    )
+    return bot_cpu + ffmpeg_cpu, audio_minutes
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    source_path = sys.argv[1]
+    options = '-vn'
+    if len(sys.argv) > 2:
+        options += f" -t {sys.argv[2]}"
+
+    if not discord.opus.is_loaded():
+        discord.opus._load_default()
+
+    pcm_cpu, minutes = measure("pcm", run_pcm, source_path, options)
+    copy_cpu, _ = measure("passthrough", run_passthrough, source_path, options)
+    if copy_cpu:
+        print(f"pass-through uses {pcm_cpu / copy_cpu:.1f}x less CPU per stream")
+        print(f"streams per core: pcm={minutes * 60 / pcm_cpu:.0f} passthrough={minutes * 60 / copy_cpu:.0f}")
+
+
+if __name__ == "__main__":
+    main()
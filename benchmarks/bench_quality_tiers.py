@@ -0,0 +1,118 @@
+"""Concurrent streams per CPU core for each FFmpeg profile and quality tier.
+
+Usage:
+    python benchmarks/bench_quality_tiers.py <file-or-url> [--streams 8] [--seconds 60]
+        [--profiles default,normalized] [--opus]
+
+For every profile/tier pair, ``--streams`` sources built by music.py's
+``make_stream_source`` (the same FFmpeg command lines the bot runs) are read
+at once as fast as possible, each in its own thread the way discord.py's
+audio players do, with PCM encoded to Opus in the bot at the tier's bitrate.
+CPU used by the bot and by FFmpeg is divided by the audio produced, which
+gives how many real-time streams one core sustains.
+
+Pass ``--opus`` when the input is 48 kHz Opus (e.g. ``yt-dlp -f 251``) so
+pass-through is used where the profile allows it. The tiers also pick
+smaller YouTube formats; to include that saving, run once per tier with a
+file downloaded in the tier's format (``-f 249`` for ``low``).
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord  # noqa: E402
+from discord.opus import Encoder  # noqa: E402
+
+from ffmpeg_supervisor import FFmpegSupervisor  # noqa: E402
+from music import FFMPEG_PROFILES, is_opus_passthrough, make_stream_source  # noqa: E402
+from quality import QUALITY_TIERS  # noqa: E402
+
+FRAME_SECONDS = Encoder.FRAME_LENGTH / 1000
+
+
+def cpu_times():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+
+def play(source, bitrate):
+    """Read a source to the end like discord.py's AudioPlayer; returns the frames produced"""
+    encoder = None if source.is_opus() else Encoder()
+    if encoder:
+        encoder.set_bitrate(bitrate)
+    frames = 0
+    while True:
+        data = source.read()
+        if not data:
+            break
+        if encoder:
+            encoder.encode(data, Encoder.SAMPLES_PER_FRAME)
+        frames += 1
+    source.cleanup()
+    return frames
+
+
+def measure(song, profile, tier, streams):
+    ffmpeg_opts = dict(FFMPEG_PROFILES[profile])
+    ffmpeg_opts['options'] = f"{ffmpeg_opts['options']} {song.limit}".strip()
+    encoding = QUALITY_TIERS[tier]
+    supervisor = FFmpegSupervisor(max_processes=streams, max_spares=0)
+
+    if is_opus_passthrough(song, ffmpeg_opts):
+        path = "pass-through"
+    else:
+        path = "ffmpeg opus" if encoding['encoder'] else "pcm + bot opus"
+
+    bot_before, ffmpeg_before = cpu_times()
+    started = time.perf_counter()
+    sources = [
+        make_stream_source(song, ffmpeg_opts, encoding, supervisor=supervisor, profile=profile, quality=tier)
+        for _ in range(streams)
+    ]
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        frames = sum(pool.map(lambda source: play(source, encoding['bitrate']), sources))
+    wall = time.perf_counter() - started
+    bot_after, ffmpeg_after = cpu_times()
+
+    audio_seconds = frames * FRAME_SECONDS
+    cpu = (bot_after - bot_before) + (ffmpeg_after - ffmpeg_before)
+    per_core = audio_seconds / cpu if cpu else float('inf')
+    print(
+        f"{profile:<12} {tier:<7} {path:<15} wall={wall:6.2f}s "
+        f"bot_cpu={bot_after - bot_before:6.2f}s ffmpeg_cpu={ffmpeg_after - ffmpeg_before:6.2f}s "
+        f"streams/core={per_core:7.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streams per core for each profile and quality tier")
+    parser.add_argument("source", help="audio file or stream URL")
+    parser.add_argument("--streams", type=int, default=8, help="sources read concurrently per measurement")
+    parser.add_argument("--seconds", type=float, default=60, help="audio seconds read from each source (0 = all)")
+    parser.add_argument("--profiles", default=",".join(FFMPEG_PROFILES), help="comma-separated FFmpeg profiles")
+    parser.add_argument("--opus", action="store_true", help="the source is 48 kHz Opus (enables pass-through)")
+    args = parser.parse_args()
+
+    if not discord.opus.is_loaded():
+        discord.opus._load_default()
+
+    song = SimpleNamespace(
+        url=args.source,
+        acodec='opus' if args.opus else None,
+        asr=48000 if args.opus else None,
+        limit=f"-t {args.seconds}" if args.seconds else "",
+    )
+    print(f"{args.streams} concurrent streams of {args.seconds or 'all'}s, {os.cpu_count()} cores")
+    for profile in args.profiles.split(","):
+        for tier in QUALITY_TIERS:
+            measure(song, profile, tier, args.streams)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Round trips and wall time for SpotifyClient against the local fake server.
+
+Usage:
+    python benchmarks/bench_spotify_client.py [--tracks 1000] [--latency 0.05]
+
+Loads the same playlist three times (cold, cached, and after the TTL has
+expired so it is revalidated with If-None-Match) and looks up 200 track
+ids one by one and in batches of 50.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_spotify import start_fake_spotify  # noqa: E402
+from spotify_client import SpotifyClient  # noqa: E402
+
+
+async def load_playlist(client):
+    playlist = await client.playlist('fake')
+    return [item async for item in client.iter_items(playlist['tracks'])]
+
+
+async def timed(app, label, coro):
+    before = app['requests']
+    started = time.perf_counter()
+    result = await coro
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed * 1000:8.1f} ms  {app['requests'] - before:4d} requests")
+    return result
+
+
+async def run(track_count, latency):
+    runner, app, base = await start_fake_spotify(track_count=track_count, latency=latency)
+    async with aiohttp.ClientSession() as session:
+        client = SpotifyClient("id", "secret", session, api_url=f"{base}/v1", token_url=f"{base}/api/token")
+        await client._get_token()
+
+        items = await timed(app, "playlist (cold)", load_playlist(client))
+        await timed(app, "playlist (cached)", load_playlist(client))
+        client.ttl = 0
+        await timed(app, "playlist (revalidated)", load_playlist(client))
+        client.ttl = 600
+
+        ids = [item['track']['id'] for item in items[:200]]
+        single = SpotifyClient("id", "secret", session, api_url=f"{base}/v1", token_url=f"{base}/api/token")
+        await single._get_token()
+        await timed(app, "200 tracks one by one", asyncio.gather(*(single.get(f"/tracks/{i}") for i in ids)))
+        await timed(app, "200 tracks batched", client.tracks(ids))
+        await timed(app, "200 tracks batched (cached)", client.tracks(ids))
+        print(client.stats())
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per Spotify response")
+    args = parser.parse_args()
+    asyncio.run(run(args.tracks, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Time to a loaded Music cog in the default configuration, against another commit.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--ref <commit>] [--legacy-files 20] [--legacy-mb 4]
+
+Each run is a fresh interpreter that imports discord.py, imports music and
+builds and loads the cog against the fake bot of ``fakes.py``: everything
+``DiscordBot.setup_hook`` does before the bot can connect to the gateway.
+No setting is overridden, so the audio store, the resolver and mapping
+sqlite files and the state backend are opened as configured (or with
+their defaults), in a scratch working directory per run. The audio store
+starts with ``--legacy-files`` files in the old ``<key>.ogg`` layout,
+which the store hashes and adopts when it loads. Only dummy Spotify
+credentials are set, since older trees refuse to start without them.
+
+It then reports whether yt-dlp was imported along the way and how long
+importing it takes on its own, and when the audio store finished loading.
+With ``--ref`` the same runs are made on that commit (exported with ``git
+archive``, e.g. the baseline commit) and both columns are printed.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+
+def child(root):
+    sys.path.insert(0, root)
+    sys.path.insert(1, BENCH_DIR)
+    timings = {}
+
+    started = time.perf_counter()
+    import discord
+    timings['import discord'] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    import music
+    timings['import music'] = time.perf_counter() - mark
+
+    from fakes import FakeBot
+
+    async def load():
+        mark = time.perf_counter()
+        cog = music.Music(FakeBot(asyncio.get_running_loop()))
+        await discord.utils.maybe_coroutine(cog.cog_load)  # Sin cog_load propio en árboles antiguos
+        timings['build + cog_load'] = time.perf_counter() - mark
+        timings['to gateway'] = time.perf_counter() - started
+
+        # Lo que queda en segundo plano tras cargar el cog
+        store = getattr(cog.music_player, 'audio_cache', None)
+        if hasattr(store, 'loaded'):
+            while not store.loaded:
+                await asyncio.sleep(0.001)
+            timings['audio store loaded'] = time.perf_counter() - started
+        await discord.utils.maybe_coroutine(cog.cog_unload)
+
+    asyncio.run(load())
+    deferred = 'yt_dlp' not in sys.modules
+
+    mark = time.perf_counter()
+    import yt_dlp  # noqa: F401
+    timings['import yt_dlp'] = time.perf_counter() - mark
+    print(json.dumps({'timings': timings, 'deferred': deferred}))
+
+
+def seed_legacy_store(workdir, files, size):
+    """Files named like the old audio cache (``<key>.ogg`` at the top of the directory)"""
+    directory = os.path.join(workdir, os.getenv("AUDIO_CACHE_DIR", "audio_cache"))
+    os.makedirs(directory, exist_ok=True)
+    for i in range(files):
+        with open(os.path.join(directory, f"{i:040x}.ogg"), 'wb') as f:
+            f.write(b'OggS' + os.urandom(size - 4))
+
+
+def export(ref, dest):
+    archive = subprocess.run(["git", "-C", ROOT, "archive", "--format=tar", ref], capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+
+
+def measure(root, args):
+    env = dict(os.environ, SPOTIFY_CLIENT_ID=os.getenv("SPOTIFY_CLIENT_ID", "bench"),
+               SPOTIFY_CLIENT_SECRET=os.getenv("SPOTIFY_CLIENT_SECRET", "bench"))
+    runs = []
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix="bench-startup-")
+        try:
+            seed_legacy_store(workdir, args.legacy_files, int(args.legacy_mb * 1024 * 1024))
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", root],
+                cwd=workdir, env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    medians = {}
+    for name in runs[0]['timings']:
+        values = sorted(run['timings'][name] for run in runs if name in run['timings'])
+        medians[name] = values[len(values) // 2]
+    return medians, all(run['deferred'] for run in runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of the Music cog")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", help="also measure this commit, e.g. the baseline")
+    parser.add_argument("--legacy-files", type=int, default=20, help="old-layout files in the audio store")
+    parser.add_argument("--legacy-mb", type=float, default=4, help="size of each of those files")
+    parser.add_argument("--child", metavar="ROOT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    columns = [("working tree", measure(ROOT, args))]
+    if args.ref:
+        tree = tempfile.mkdtemp(prefix="bench-startup-ref-")
+        try:
+            export(args.ref, tree)
+            columns.append((args.ref, measure(tree, args)))
+        finally:
+            shutil.rmtree(tree, ignore_errors=True)
+
+    ms = 1000
+    names = list(dict.fromkeys(name for _, (medians, _) in columns for name in medians))
+    print(f"{args.runs} fresh interpreters, {args.legacy_files} x {args.legacy_mb:g} MB old-layout files, median times:")
+    print(f"  {'':<20}" + "".join(f"{label:>16}" for label, _ in columns))
+    for name in names:
+        cells = "".join(
+            f"{medians[name] * ms:14.1f}ms" if name in medians else f"{'-':>16}" for _, (medians, _) in columns
+        )
+        print(f"  {name:<20}{cells}")
+    print(f"  {'yt-dlp deferred':<20}" + "".join(f"{str(deferred):>16}" for _, (_, deferred) in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Bytes per queued entry: the old song dicts vs Track objects.
+
+Usage:
+    python benchmarks/bench_track_memory.py [entries]
+
+Builds a queue of ``entries`` songs (default 10000) from payloads shaped
+like Spotify playlist items, once as the dicts the queue used to hold and
+once as Track objects, and reports tracemalloc's allocation per entry.
+Strings are rebuilt per entry, as they would be after JSON parsing, so
+interning is measured honestly.
+"""
+import os
+import sys
+import tracemalloc
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from track import Track  # noqa: E402
+
+
+def fresh(text):
+    """Una copia nueva de la cadena, como la que sale de json.loads"""
+    return ''.join(list(text))
+
+
+def spotify_payload(i):
+    album = i // 12
+    return {
+        'id': f"{i:022d}",
+        'name': fresh(f"Song number {i}"),
+        'artists': [{'name': fresh(f"Artist {album % 50}")}],
+        'album': {'images': [{'url': fresh(f"https://i.scdn.co/image/ab67616d0000b273{album:024x}")}]},
+        'duration_ms': 180000 + i,
+        'external_ids': {'isrc': f"US{i:010d}"},
+    }
+
+
+def as_dict(track):
+    return {
+        'title': f"{track['name']} - {track['artists'][0]['name']}",
+        'search_query': f"{track['name']} {track['artists'][0]['name']}",
+        'spotify_id': track.get('id'),
+        'isrc': track.get('external_ids', {}).get('isrc'),
+        'thumbnail': track['album']['images'][0]['url'] if track['album']['images'] else None,
+        'duration': track['duration_ms'] // 1000
+    }
+
+
+def measure(label, build, entries):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    # Cada payload se descarta tras construir la entrada, como al cargar una playlist
+    queue = deque(build(spotify_payload(i)) for i in range(entries))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    print(f"{label:<6} entries={len(queue)} total={size / 1024 / 1024:6.2f} MiB per_entry={size / len(queue):6.0f} B")
+    return size
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    dict_bytes = measure("dict", as_dict, entries)
+    track_bytes = measure("Track", lambda payload: Track.create(spotify=payload), entries)
+    print(f"Track uses {100 * (1 - track_bytes / dict_bytes):.0f}% less memory per entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Round trip of a guild's player state through the redis backend, and a resume from it.
+
+Usage:
+    python benchmarks/check_state_store.py
+
+A Music cog against the fake bot of ``fakes.py`` gets a queue and a song
+30 s into playback; its state is flushed through
+``StateStore(RedisBackend(FakeRedis()))``. A second cog, as after a restart,
+loads it from the same fake redis and resumes: the interrupted song must
+start again at its saved position with the rest of the queue behind it.
+Also checks that the ``memory`` backend never snapshots. Needs discord.py,
+yt-dlp and aiohttp installed, but no redis server, network or FFmpeg.
+"""
+import asyncio
+import os
+import sys
+import time
+
+# Antes de importar music: nada en disco ni endpoint de métricas
+os.environ.update({
+    'AUDIO_CACHE_MAX_MB': '0',
+    'MAPPING_DB': '',
+    'STATE_BACKEND': 'memory',
+    'EXTRACTOR_MODE': 'thread',
+    'METRICS_PORT': '0',
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeBot, FakeRedis, FakeSource  # noqa: E402
+from music import Music  # noqa: E402
+from state_store import MemoryBackend, RedisBackend, StateStore  # noqa: E402
+from track import Track  # noqa: E402
+
+GUILD_ID = 1
+TITLES = [f"Song {i}" for i in range(5)]
+
+
+async def start_cog(redis):
+    """A loaded cog saving to ``redis``; returns it, its guild and the (title, offset) of every source built"""
+    bot = FakeBot(asyncio.get_running_loop())
+    guild = bot.add_guild(GUILD_ID, track_seconds=60)
+    cog = Music(bot)
+    await cog.cog_load()
+    player = cog.music_player
+    player.state = StateStore(RedisBackend(redis), player.snapshot)
+    built = []
+
+    def build_source(guild_id, song, spare=False):
+        # start_track pone start_offset a 0 en cuanto arranca: el salto se ve aquí
+        built.append((song.title, song.start_offset))
+        return FakeSource(song, player.quality.tier(guild_id))
+
+    player.build_source = build_source
+    return cog, guild, built
+
+
+async def check_round_trip():
+    redis = FakeRedis()
+    cog, guild, _ = await start_cog(redis)
+    player = cog.music_player
+    # Sin webpage_url: ninguna canción necesita yt-dlp para volver a sonar
+    songs = [Track(title, duration=180, url=f"https://stream.invalid/{i}") for i, title in enumerate(TITLES)]
+    await guild.voice_channel.connect()
+    player.text_channels[GUILD_ID] = guild.text_channel.id
+    player.playing[GUILD_ID] = (songs[0], time.monotonic() - 30, 0)
+    player.get_queue(GUILD_ID).extend(songs[1:])
+    await player.state.flush()
+    saved = redis.hashes.get("musicbot:state", {})
+    await cog.cog_unload()
+    if str(GUILD_ID) not in saved:
+        return "no snapshot written to redis"
+
+    cog, guild, built = await start_cog(redis)
+    player = cog.music_player
+    await player.resume_all()
+    for _ in range(100):
+        if guild.voice_client and guild.voice_client.source:
+            break
+        await asyncio.sleep(0.01)
+    queued = [song.title for song in player.get_queue(GUILD_ID)]
+    await cog.cog_unload()
+    if not built or built[0][0] != TITLES[0]:
+        return f"resumed {built[0][0] if built else 'nothing'} instead of {TITLES[0]}"
+    if built[0][1] != 30:
+        return f"resumed at {built[0][1]}s instead of 30s"
+    if queued != TITLES[1:]:
+        return f"queue after resume is {queued}"
+    return None
+
+
+async def check_memory_skips():
+    calls = []
+    store = StateStore(MemoryBackend(), lambda guild_id: calls.append(guild_id) or {})
+    store.mark_dirty(GUILD_ID)
+    await store.flush()
+    return f"memory backend snapshotted {len(calls)} guilds" if calls else None
+
+
+async def run():
+    failed = False
+    for name, check in (("redis round trip + resume", check_round_trip), ("memory backend skips", check_memory_skips)):
+        error = await check()
+        failed |= error is not None
+        print(f"{name:<28} {'FAIL: ' + error if error else 'ok'}")
+    return failed
+
+
+def main():
+    sys.exit(1 if asyncio.run(run()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Local stand-in for the parts of the Spotify Web API the bot uses.
+
+Usage:
+    python benchmarks/fake_spotify.py [--port 8765] [--tracks 500]
+
+Then start the bot with
+    SPOTIFY_API_URL=http://127.0.0.1:8765/v1
+    SPOTIFY_TOKEN_URL=http://127.0.0.1:8765/api/token
+    SPOTIFY_CLIENT_ID=fake SPOTIFY_CLIENT_SECRET=fake
+(any non-empty credentials: the fake accepts them all, but the bot asks
+for a token only when both are set). Every server has one playlist, ``fake``, with
+``--tracks`` items, served 100 per page like the real API. Responses carry
+an ETag and honour If-None-Match, and every request is counted in
+``server['requests']`` so benchmarks can check how many round trips a
+client made.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+
+from aiohttp import web
+
+PAGE_SIZE = 100
+
+
+def fake_track(index):
+    return {
+        'id': f"track{index:06d}",
+        'name': f"Song {index}",
+        'artists': [{'name': f"Artist {index % 50}"}],
+        'album': {'images': [{'url': f"https://example.invalid/cover/{index % 50}.jpg"}]},
+        'duration_ms': 180000 + (index % 120) * 1000,
+        'external_ids': {'isrc': f"FAKE{index:08d}"},
+    }
+
+
+def make_app(track_count=500, latency=0.0):
+    """aiohttp app serving /api/token, /v1/playlists/{id}, its paged tracks and /v1/tracks"""
+    app = web.Application()
+    app['tracks'] = {track['id']: track for track in map(fake_track, range(track_count))}
+    app['requests'] = 0
+
+    @web.middleware
+    async def count_and_delay(request, handler):
+        app['requests'] += 1
+        if latency:
+            await asyncio.sleep(latency)
+        return await handler(request)
+
+    app.middlewares.append(count_and_delay)
+
+    def respond(request, data):
+        body = json.dumps(data)
+        etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(text=body, content_type='application/json', headers={'ETag': etag})
+
+    def authorized(request):
+        return request.headers.get('Authorization', '').startswith('Bearer fake-')
+
+    def tracks_page(request, offset):
+        base = f"{request.url.origin()}/v1/playlists/fake/tracks"
+        ids = list(app['tracks'])
+        items = [{'track': app['tracks'][track_id]} for track_id in ids[offset:offset + PAGE_SIZE]]
+        has_next = offset + PAGE_SIZE < len(ids)
+        return {
+            'items': items,
+            'offset': offset,
+            'limit': PAGE_SIZE,
+            'total': len(ids),
+            'next': f"{base}?offset={offset + PAGE_SIZE}&limit={PAGE_SIZE}" if has_next else None,
+        }
+
+    async def token(request):
+        return web.json_response({'access_token': f"fake-{app['requests']}", 'token_type': 'Bearer', 'expires_in': 3600})
+
+    async def playlist(request):
+        if not authorized(request):
+            return web.Response(status=401)
+        if request.match_info['playlist_id'] != 'fake':
+            return web.Response(status=404)
+        return respond(request, {'id': 'fake', 'name': 'Fake Playlist', 'images': [], 'tracks': tracks_page(request, 0)})
+
+    async def playlist_tracks(request):
+        if not authorized(request):
+            return web.Response(status=401)
+        return respond(request, tracks_page(request, int(request.query.get('offset', 0))))
+
+    async def track(request):
+        if not authorized(request):
+            return web.Response(status=401)
+        found = app['tracks'].get(request.match_info['track_id'])
+        return respond(request, found) if found else web.Response(status=404)
+
+    async def tracks(request):
+        if not authorized(request):
+            return web.Response(status=401)
+        ids = request.query.get('ids', '').split(',')
+        if len(ids) > 50:
+            return web.Response(status=400)
+        return respond(request, {'tracks': [app['tracks'].get(track_id) for track_id in ids]})
+
+    app.router.add_post('/api/token', token)
+    app.router.add_get('/v1/playlists/{playlist_id}', playlist)
+    app.router.add_get('/v1/playlists/{playlist_id}/tracks', playlist_tracks)
+    app.router.add_get('/v1/tracks/{track_id}', track)
+    app.router.add_get('/v1/tracks', tracks)
+    return app
+
+
+async def start_fake_spotify(port=0, track_count=500, latency=0.0):
+    """Start the fake server; returns (runner, app, base_url). ``port=0`` picks a free port"""
+    app = make_app(track_count, latency)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, app, f"http://127.0.0.1:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Spotify Web API for local testing")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tracks", type=int, default=500, help="items in the 'fake' playlist")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+    web.run_app(make_app(args.tracks, args.latency), host='127.0.0.1', port=args.port)
+
+
+if __name__ == "__main__":
+    main()
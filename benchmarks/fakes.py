@@ -0,0 +1,253 @@
+"""In-process stand-ins for external services, for benchmarks and local checks."""
+import itertools
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeRedis:
+    """The subset of ``redis.asyncio.Redis`` used by RedisBackend, kept in memory"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.calls = 0
+
+    async def hgetall(self, key):
+        self.calls += 1
+        return {field.encode(): value.encode() for field, value in self.hashes.get(key, {}).items()}
+
+    async def hset(self, key, mapping):
+        self.calls += 1
+        self.hashes.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def hdel(self, key, *fields):
+        self.calls += 1
+        hash_ = self.hashes.get(key, {})
+        return sum(hash_.pop(field, None) is not None for field in fields)
+
+    async def aclose(self):
+        pass
+
+
+class FakeYoutubeDL:
+    """``yt_dlp.YoutubeDL`` look-alike: sleeps ``latency`` seconds and returns made-up videos.
+
+    Search results are derived from the query, so the same query always
+    resolves to the same video ids.
+    """
+
+    def __init__(self, params=None, latency=0.3, candidates=5):
+        self.params = params or {}
+        self.latency = latency
+        self.candidates = candidates
+
+    def video(self, video_id, title):
+        return {
+            'id': video_id,
+            'url': f"https://stream.invalid/{video_id}?expire={int(time.time()) + 21600}",
+            'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+            'title': title,
+            'thumbnail': f"https://i.invalid/{video_id}.jpg",
+            'duration': 180 + sum(map(ord, video_id)) % 120,
+            'acodec': 'opus',
+            'asr': 48000,
+            'channel': f"{title.split()[0]} - Topic",
+        }
+
+    def extract_info(self, target, download=False):
+        time.sleep(self.latency)
+        if target.startswith('ytsearch'):
+            count, query = target[len('ytsearch'):].split(':', 1)
+            count = int(count or 1)
+            ids = [f"{abs(hash((query, n))) % 10 ** 11:011d}" for n in range(count)]
+            return {'entries': [self.video(video_id, query) for video_id in ids]}
+        video_id = parse_qs(urlparse(target).query).get('v', [target[-11:]])[0]
+        return self.video(video_id, f"Video {video_id}")
+
+
+class FakeMessage:
+    ids = itertools.count(1)
+
+    def __init__(self, channel, content=None):
+        self.id = next(self.ids)
+        self.channel = channel
+        self.content = content
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        self.edits += 1
+        self.content = kwargs.get('content', self.content)
+
+    async def delete(self):
+        pass
+
+
+class FakeTextChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+        return FakeMessage(self, content)
+
+    def permissions_for(self, member):
+        return type('Permissions', (), {'send_messages': True})()
+
+
+class FakeVoiceClient:
+    """Plays a source by reading one packet, then "ends" after ``track_seconds`` on its own thread.
+
+    Like discord.py's AudioPlayer, the ``after`` callback runs on that
+    thread, so the hand-off from the audio thread to the event loop is exercised.
+    """
+
+    def __init__(self, bot, guild, channel, track_seconds):
+        self.bot = bot
+        self.guild = guild
+        self.channel = channel
+        self.track_seconds = track_seconds
+        self.source = None
+        self.paused = False
+        self.connected = True
+        self.stop_event = None
+        self.tracks = 0
+
+    def is_connected(self):
+        return self.connected
+
+    def is_playing(self):
+        return self.source is not None and not self.paused
+
+    def is_paused(self):
+        return self.source is not None and self.paused
+
+    def play(self, source, after=None, bitrate=128):
+        if self.source is not None:
+            raise RuntimeError("Already playing audio.")
+        self.source = source
+        self.paused = False
+        self.tracks += 1
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._play, args=(source, after, self.stop_event), daemon=True).start()
+
+    def _play(self, source, after, stop):
+        source.read()
+        stop.wait(self.track_seconds)
+        source.cleanup()
+        if self.source is source:
+            self.source = None
+        if after:
+            after(None)
+
+    def stop(self):
+        self.source = None
+        if self.stop_event:
+            self.stop_event.set()
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+    async def move_to(self, channel):
+        self.channel = channel
+
+    async def disconnect(self, force=False):
+        self.connected = False
+        self.stop()
+        self.guild.voice_client = None
+        if self in self.bot.voice_clients:
+            self.bot.voice_clients.remove(self)
+
+
+class FakeVoiceChannel:
+    def __init__(self, bot, guild, channel_id, track_seconds, bitrate=64000):
+        self.bot = bot
+        self.guild = guild
+        self.id = channel_id
+        self.bitrate = bitrate
+        self.track_seconds = track_seconds
+
+    async def connect(self):
+        vc = FakeVoiceClient(self.bot, self.guild, self, self.track_seconds)
+        self.guild.voice_client = vc
+        self.bot.voice_clients.append(vc)
+        return vc
+
+
+class FakeSource:
+    """Stands in for a supervised FFmpeg source; no process is started"""
+
+    def __init__(self, song, quality=None):
+        self.song = song
+        self.quality = quality
+        self.reclaimed = False
+        self.on_first_packet = None
+        self.read_once = False
+
+    def read(self):
+        if not self.read_once and self.on_first_packet:
+            self.on_first_packet(time.perf_counter())
+        self.read_once = True
+        return b"\0" * 3840
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        pass
+
+
+class FakeGuild:
+    def __init__(self, bot, guild_id, track_seconds):
+        self.id = guild_id
+        self.voice_client = None
+        self.me = FakeMember("bot", None)
+        self.text_channel = FakeTextChannel(guild_id * 10 + 1)
+        self.voice_channel = FakeVoiceChannel(bot, self, guild_id * 10 + 2, track_seconds)
+        self.text_channels = [self.text_channel]
+
+    def get_channel(self, channel_id):
+        return {self.text_channel.id: self.text_channel, self.voice_channel.id: self.voice_channel}.get(channel_id)
+
+
+class FakeMember:
+    def __init__(self, name, voice_channel):
+        self.name = name
+        self.voice = type('VoiceState', (), {'channel': voice_channel})() if voice_channel else None
+
+
+class FakeContext:
+    """The parts of ``commands.Context`` the Music cog uses"""
+
+    def __init__(self, guild, author_name="listener"):
+        self.guild = guild
+        self.channel = guild.text_channel
+        self.author = FakeMember(author_name, guild.voice_channel)
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+class FakeBot:
+    def __init__(self, loop):
+        self.loop = loop
+        self.voice_clients = []
+        self.guilds = {}
+
+    def add_guild(self, guild_id, track_seconds):
+        self.guilds[guild_id] = FakeGuild(self, guild_id, track_seconds)
+        return self.guilds[guild_id]
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    def add_view(self, view, message_id=None):
+        pass
@@ -0,0 +1,218 @@
+"""Run the bot as several processes, each owning a range of shards.
+
+Usage:
+    python cluster.py --workers 4 [--shards 16] [--mock]
+
+Without ``--shards`` the recommended shard count is read from Discord's
+``/gateway/bot`` endpoint. ``--mock`` runs workers against a simulated
+gateway (no token or network needed) that reports fake shard stats and
+crashes now and then, to exercise supervision and restarts locally.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import random
+import time
+import urllib.request
+
+STATS_INTERVAL = float(os.getenv("CLUSTER_STATS_INTERVAL", "30"))
+STABLE_SECONDS = 300
+
+
+def shard_ranges(shard_count, workers):
+    """Split shard ids 0..shard_count-1 into ``workers`` contiguous ranges"""
+    workers = max(1, min(workers, shard_count))
+    base, extra = divmod(shard_count, workers)
+    ranges = []
+    start = 0
+    for worker in range(workers):
+        size = base + (1 if worker < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def fetch_shard_count(token):
+    """Recommended shard count from Discord's /gateway/bot"""
+    request = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={'Authorization': f"Bot {token}", 'User-Agent': "DiscordBot (cluster.py)"},
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)['shards']
+
+
+def run_worker(cluster_id, shard_ids, shard_count, stats_queue):
+    """Worker process: one AutoShardedBot owning ``shard_ids``"""
+    if int(os.getenv("METRICS_PORT", "0")):
+        # Un puerto de métricas por worker: METRICS_PORT, METRICS_PORT + 1, ...
+        os.environ["METRICS_PORT"] = str(int(os.environ["METRICS_PORT"]) + cluster_id)
+    # Cada worker tiene su propio almacén de audio: el índice no se comparte entre procesos
+    os.environ["AUDIO_CACHE_DIR"] = os.path.join(os.getenv("AUDIO_CACHE_DIR", "audio_cache"), f"cluster-{cluster_id}")
+    from main import BOT_TOKEN, DiscordBot
+
+    async def report(bot):
+        await bot.wait_until_ready()
+        while not bot.is_closed():
+            stats_queue.put((cluster_id, time.time(), bot.shard_stats()))
+            await asyncio.sleep(STATS_INTERVAL)
+
+    async def main():
+        async with DiscordBot(shard_ids=shard_ids, shard_count=shard_count) as bot:
+            bot.loop.create_task(report(bot))
+            await bot.start(BOT_TOKEN)
+
+    asyncio.run(main())
+
+
+def run_mock_worker(cluster_id, shard_ids, shard_count, stats_queue, crash_chance=0.05):
+    """Worker process against a simulated gateway: fake stats, random crashes"""
+    rng = random.Random()
+    guilds = {shard_id: rng.randint(50, 500) for shard_id in shard_ids}
+    while True:
+        stats = {
+            shard_id: {
+                'latency': rng.uniform(0.03, 0.2),
+                'guilds': guilds[shard_id],
+                'voice_clients': rng.randint(0, guilds[shard_id] // 10),
+            }
+            for shard_id in shard_ids
+        }
+        stats_queue.put((cluster_id, time.time(), stats))
+        if rng.random() < crash_chance:
+            raise SystemExit(1)
+        time.sleep(min(STATS_INTERVAL, 1.0))
+
+
+class ClusterLauncher:
+    """Starts one worker process per shard range and restarts any that exit"""
+
+    def __init__(self, shard_count, workers, target=run_worker, restart_delay=5.0, max_restart_delay=300.0):
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, workers)
+        self.target = target
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.context = multiprocessing.get_context('spawn')
+        self.stats_queue = self.context.Queue()
+        self.processes = {}
+        self.restarts = {cluster_id: 0 for cluster_id in range(len(self.ranges))}
+        self.failures = {cluster_id: 0 for cluster_id in range(len(self.ranges))}  # fallos seguidos, para el backoff
+        self.started_at = {}
+        self.next_start = {cluster_id: 0.0 for cluster_id in range(len(self.ranges))}
+        self.shard_stats = {}  # shard id -> últimas estadísticas
+        self.last_report = {}  # cluster id -> timestamp
+
+    def start_worker(self, cluster_id):
+        process = self.context.Process(
+            target=self.target,
+            args=(cluster_id, self.ranges[cluster_id], self.shard_count, self.stats_queue),
+            name=f"cluster-{cluster_id}",
+            # No daemon: un proceso daemon no puede tener hijos (EXTRACTOR_MODE=process); stop() los termina
+        )
+        process.start()
+        self.processes[cluster_id] = process
+        self.started_at[cluster_id] = time.monotonic()
+        print(f"Cluster {cluster_id} started (pid {process.pid}, shards {self.ranges[cluster_id]})")
+
+    def supervise_once(self):
+        """Restart dead workers (with exponential backoff) and collect stats"""
+        now = time.monotonic()
+        for cluster_id in range(len(self.ranges)):
+            process = self.processes.get(cluster_id)
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                self.restarts[cluster_id] += 1
+                # Un worker que aguantó un rato vuelve a arrancar sin castigo
+                if now - self.started_at[cluster_id] > STABLE_SECONDS:
+                    self.failures[cluster_id] = 0
+                self.failures[cluster_id] += 1
+                delay = min(self.max_restart_delay, self.restart_delay * 2 ** (self.failures[cluster_id] - 1))
+                self.next_start[cluster_id] = now + delay
+                print(f"Cluster {cluster_id} exited with code {process.exitcode}, restarting in {delay:.0f}s")
+                self.processes.pop(cluster_id)
+            if now >= self.next_start[cluster_id]:
+                self.start_worker(cluster_id)
+
+        while True:
+            try:
+                cluster_id, reported_at, stats = self.stats_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.last_report[cluster_id] = reported_at
+            self.shard_stats.update(stats)
+
+    def aggregate(self):
+        """Totals across every shard plus the per-shard breakdown"""
+        shards = dict(sorted(self.shard_stats.items()))
+        # latency es NaN hasta el primer heartbeat de cada shard
+        latencies = [stats['latency'] for stats in shards.values() if stats['latency'] == stats['latency']]
+        return {
+            'workers_alive': sum(process.is_alive() for process in self.processes.values()),
+            'workers': len(self.ranges),
+            'restarts': sum(self.restarts.values()),
+            'guilds': sum(stats['guilds'] for stats in shards.values()),
+            'voice_clients': sum(stats['voice_clients'] for stats in shards.values()),
+            'max_latency': max(latencies, default=0.0),
+            'shards': shards,
+        }
+
+    def run(self, interval=1.0, report_every=STATS_INTERVAL, duration=None):
+        started = time.monotonic()
+        last_print = 0.0
+        try:
+            while duration is None or time.monotonic() - started < duration:
+                self.supervise_once()
+                if time.monotonic() - last_print >= report_every:
+                    last_print = time.monotonic()
+                    self.print_report()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def print_report(self):
+        stats = self.aggregate()
+        print(
+            f"[cluster] workers {stats['workers_alive']}/{stats['workers']} • restarts {stats['restarts']} • "
+            f"guilds {stats['guilds']} • voice {stats['voice_clients']} • max latency {stats['max_latency'] * 1000:.0f}ms"
+        )
+        for shard_id, shard in stats['shards'].items():
+            print(f"  shard {shard_id}: {shard['guilds']} guilds, {shard['voice_clients']} voice, {shard['latency'] * 1000:.0f}ms")
+
+    def stop(self):
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot across several shard-owning processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("CLUSTER_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--shards", type=int, default=int(os.getenv("SHARD_COUNT", "0")) or None)
+    parser.add_argument("--mock", action="store_true", help="use a simulated gateway instead of Discord")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args()
+
+    if args.mock:
+        shard_count = args.shards or args.workers * 2
+        launcher = ClusterLauncher(shard_count, args.workers, target=run_mock_worker, restart_delay=1.0)
+        launcher.run(report_every=5.0, duration=args.duration)
+        return
+
+    shard_count = args.shards or fetch_shard_count(os.getenv("BOT_TOKEN"))
+    ClusterLauncher(shard_count, args.workers).run(duration=args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import EXTRACTION_SECONDS, percentile
+
+EXTRACTOR_WORKERS = int(os.getenv("EXTRACTOR_WORKERS", "4"))
+EXTRACTOR_MODE = os.getenv("EXTRACTOR_MODE", "thread")  # "thread" o "process"
+
+# Campos que el bot usa de cada vídeo; el resto del info dict (formats, subtítulos...) no se devuelve
+RECORD_FIELDS = ('id', 'url', 'webpage_url', 'title', 'thumbnail', 'duration', 'acodec', 'asr', 'channel')
+
+# Una caché de YoutubeDL por hilo (modo thread) o por proceso (modo process)
+_local = threading.local()
+
+
+def options_key(opts):
+    return json.dumps(opts, sort_keys=True, default=str)
+
+
+def compact_record(video):
+    record = {field: video.get(field) for field in RECORD_FIELDS}
+    if not record['url']:
+        record['url'] = video.get('formats', [{}])[0].get('url')
+    return record
+
+
+def compact_info(info):
+    """Reduce a yt-dlp info dict to small song records that are cheap to pickle"""
+    if 'entries' in info:
+        return {'entries': [compact_record(entry) for entry in info['entries'] if entry]}
+    return compact_record(info)
+
+
+def warm_up():
+    """Import yt-dlp in a worker ahead of its first lookup"""
+    import yt_dlp  # noqa: F401
+
+
+def extract_in_worker(key, opts, target, enqueued_at):
+    """Worker entry point; returns (compact info, seconds queued, seconds running)"""
+    # yt-dlp tarda en importarse: se carga en el worker, no al importar este módulo
+    import yt_dlp
+
+    started_at = time.time()
+    instances = getattr(_local, 'instances', None)
+    if instances is None:
+        instances = _local.instances = {}
+    if key not in instances:
+        instances[key] = yt_dlp.YoutubeDL(opts)
+    info = compact_info(instances[key].extract_info(target, download=False))
+    return info, started_at - enqueued_at, time.time() - started_at
+
+
+class ExtractorPool:
+    """Dedicated executor for yt-dlp lookups.
+
+    Each worker keeps one ``YoutubeDL`` per options set instead of building
+    a new one per request, and concurrent calls for the same target and
+    options share a single in-flight extraction. With ``mode='process'``
+    extraction runs in separate worker processes so signature deciphering
+    and JSON parsing don't hold the bot's GIL; results come back as compact
+    song records either way.
+    """
+
+    def __init__(self, max_workers=EXTRACTOR_WORKERS, mode=EXTRACTOR_MODE, worker=extract_in_worker):
+        self.max_workers = max_workers
+        self.mode = mode
+        self.worker = worker
+        if mode == 'process':
+            # spawn: no heredar hilos ni el event loop del bot
+            self.executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix='ytdl')
+        self.in_flight = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.wait_times = deque(maxlen=500)  # tiempo en cola antes de empezar
+        self.run_times = deque(maxlen=500)  # duración de extract_info
+
+    async def _run(self, key, opts, target):
+        info, waited, ran = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.worker, key, opts, target, time.time()
+        )
+        self.wait_times.append(waited)
+        self.run_times.append(ran)
+        EXTRACTION_SECONDS.observe(waited + ran)
+        return info
+
+    async def extract_info(self, opts, target):
+        """Run ``extract_info(target, download=False)`` on the pool and return compact records"""
+        key = options_key(opts)
+        flight_key = (key, target)
+        future = self.in_flight.get(flight_key)
+        if future is not None:
+            self.deduplicated += 1
+        else:
+            self.submitted += 1
+            future = asyncio.ensure_future(self._run(key, opts, target))
+            self.in_flight[flight_key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(flight_key, None))
+        # shield: si un llamador se cancela, los demás siguen esperando el mismo resultado
+        return await asyncio.shield(future)
+
+    def queue_depth(self):
+        return max(0, len(self.in_flight) - self.max_workers)
+
+    def stats(self):
+        waits = list(self.wait_times)
+        runs = list(self.run_times)
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'submitted': self.submitted,
+            'deduplicated': self.deduplicated,
+            'in_flight': len(self.in_flight),
+            'queue_depth': self.queue_depth(),
+            'wait_p50': percentile(waits, 0.5),
+            'wait_p99': percentile(waits, 0.99),
+            'run_p50': percentile(runs, 0.5),
+            'run_p99': percentile(runs, 0.99),
+        }
+
+    def warm(self):
+        """Import yt-dlp in the workers now (each worker, in process mode) instead of on the first lookup"""
+        for _ in range(self.max_workers if self.mode == 'process' else 1):
+            self.executor.submit(warm_up)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,314 @@
+import asyncio
+import functools
+import os
+import shutil
+import time
+import weakref
+
+import discord
+
+from metrics import FFMPEG_SPAWN_SECONDS, VOICE_JITTER_SECONDS
+
+try:
+    import resource
+except ImportError:  # Windows: sin límites por proceso
+    resource = None
+
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+FFMPEG_MAX_PROCESSES = int(os.getenv("FFMPEG_MAX_PROCESSES", "64"))
+FFMPEG_WARM_SPARES = int(os.getenv("FFMPEG_WARM_SPARES", "8"))
+FFMPEG_MEMORY_MB = int(os.getenv("FFMPEG_MEMORY_MB", "512"))
+FFMPEG_CPU_SECONDS = int(os.getenv("FFMPEG_CPU_SECONDS", "0"))  # 0 = sin límite de CPU
+FFMPEG_MAX_FILES = 64
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU seconds used by ``pid`` so far, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class FFmpegCapacityError(discord.ClientException):
+    pass
+
+
+class FFmpegNotFoundError(discord.ClientException):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_executable():
+    """Absolute path of the FFmpeg binary, looked up on first use (a failed lookup is retried next time)"""
+    path = shutil.which(FFMPEG_PATH)
+    if path is None:
+        raise FFmpegNotFoundError(f"FFmpeg not found ({FFMPEG_PATH}); install it or set FFMPEG_PATH")
+    return path
+
+
+class TimedSource:
+    """Mixin for audio sources that report their first packet and the voice send jitter"""
+
+    def __init__(self, *args, quality=None, spare=False, **kwargs):
+        # FFmpegAudio lanza el proceso dentro de su __init__, así que esto va antes
+        self.quality = quality
+        self.spare = spare
+        self.reclaimed = False
+        self.on_first_packet = None  # callback(perf_counter) al leer el primer paquete
+        self.last_read = None
+        super().__init__(*args, **kwargs)
+
+    def read(self):
+        # El hilo de audio de discord.py pide un paquete cada 20 ms
+        now = time.perf_counter()
+        if self.last_read is None:
+            if self.on_first_packet:
+                self.on_first_packet(now)
+        elif now - self.last_read < 0.5:  # un hueco mayor es una pausa, no jitter
+            VOICE_JITTER_SECONDS.observe(abs(now - self.last_read - 0.02))
+        self.last_read = now
+        return super().read()
+
+
+class SupervisedSource(TimedSource):
+    """Mixin for discord.py FFmpeg sources whose process is accounted for by an FFmpegSupervisor"""
+
+    def __init__(self, *args, supervisor, guild_id=None, profile=None, **kwargs):
+        self.supervisor = supervisor
+        self.guild_id = guild_id
+        self.profile = profile
+        kwargs.setdefault('executable', ffmpeg_executable())
+        super().__init__(*args, **kwargs)
+
+    def _spawn_process(self, args, **subprocess_kwargs):
+        self.supervisor.make_room(self.spare)
+        started = time.perf_counter()
+        process = super()._spawn_process(args, **subprocess_kwargs)
+        FFMPEG_SPAWN_SECONDS.observe(time.perf_counter() - started)
+        self.supervisor.register(self, process)
+        return process
+
+    def _kill_process(self):
+        process = getattr(self, '_process', None)
+        if process:
+            self.supervisor.release(process)
+        super()._kill_process()
+
+
+class SupervisedPCMAudio(SupervisedSource, discord.FFmpegPCMAudio):
+    pass
+
+
+class SupervisedOpusAudio(SupervisedSource, discord.FFmpegOpusAudio):
+    pass
+
+
+class FFmpegSupervisor:
+    """Accounts for every FFmpeg process the bot runs and keeps them bounded.
+
+    At most ``max_processes`` run at once. Warm spares (sources spawned
+    ahead of time by the prefetcher) are limited to ``max_spares`` and are
+    the first to go: a live stream that hits the cap reclaims the oldest
+    spare instead of failing. Audio store downloads (``run_download``) also
+    take slots, only free ones, and are reclaimed after the spares. Each
+    process gets address-space, CPU-time and open-file limits where the
+    platform supports ``prlimit``, and processes that exited or whose source
+    was dropped without cleanup are reaped periodically.
+    """
+
+    def __init__(self, max_processes=FFMPEG_MAX_PROCESSES, max_spares=FFMPEG_WARM_SPARES,
+                 memory_mb=FFMPEG_MEMORY_MB, cpu_seconds=FFMPEG_CPU_SECONDS, max_files=FFMPEG_MAX_FILES,
+                 reap_interval=30.0):
+        self.max_processes = max_processes
+        self.max_spares = max_spares
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.max_files = max_files
+        self.reap_interval = reap_interval
+        self.processes = {}  # pid -> {'process', 'source' (weakref), 'guild_id', 'profile', 'quality', 'spare', 'started_at'}
+        self.downloads = {}  # pid -> asyncio.subprocess.Process de las descargas de la caché de audio
+        self.task = None
+        self.spawned = 0
+        self.rejected = 0
+        self.reclaimed = 0
+        self.reaped = 0
+        self.finished = 0
+        self.finished_cpu_seconds = 0.0
+
+    def spares(self):
+        return [entry for entry in list(self.processes.values()) if entry['spare']]
+
+    def running(self):
+        return len(self.processes) + len(self.downloads)
+
+    def can_warm(self):
+        """True if a warm spare can be spawned now without crowding out live streams"""
+        self.reap()
+        return len(self.spares()) < self.max_spares and self.running() < self.max_processes
+
+    def make_room(self, spare):
+        """Called right before a spawn; raises FFmpegCapacityError if no slot can be freed"""
+        self.reap()
+        if self.running() < self.max_processes:
+            return
+        if not spare:
+            for entry in sorted(self.spares(), key=lambda entry: entry['started_at']):
+                self.reclaimed += 1
+                source = entry['source']()
+                if source is not None:
+                    source.reclaimed = True  # el prefetcher ya no debe entregarla
+                    source.cleanup()
+                else:
+                    self._kill(entry['process'])
+                if self.running() < self.max_processes:
+                    return
+            # Después, las descargas de la caché: se reintentan en la siguiente reproducción
+            for pid, process in list(self.downloads.items()):
+                self.reclaimed += 1
+                self.downloads.pop(pid, None)
+                process.kill()
+                if self.running() < self.max_processes:
+                    return
+        self.rejected += 1
+        raise FFmpegCapacityError(f"FFmpeg process limit reached ({self.max_processes})")
+
+    def _limit(self, pid):
+        if resource is None or not hasattr(resource, 'prlimit'):
+            return
+        limits = []
+        if self.memory_mb:
+            limits.append((resource.RLIMIT_AS, self.memory_mb * 1024 * 1024))
+        if self.cpu_seconds:
+            limits.append((resource.RLIMIT_CPU, self.cpu_seconds))
+        if self.max_files:
+            limits.append((resource.RLIMIT_NOFILE, self.max_files))
+        try:
+            for limit, value in limits:
+                resource.prlimit(pid, limit, (value, value))
+        except (OSError, ValueError) as e:
+            print(f"Error limiting FFmpeg process {pid}: {e}")
+
+    def register(self, source, process):
+        self._limit(process.pid)
+        self.spawned += 1
+        self.processes[process.pid] = {
+            'process': process,
+            'source': weakref.ref(source),
+            'guild_id': source.guild_id,
+            'profile': source.profile,
+            'quality': source.quality,
+            'spare': source.spare,
+            'started_at': time.monotonic(),
+        }
+
+    async def run_download(self, *command):
+        """Run an FFmpeg ``command`` that writes a file to completion and return its exit code.
+
+        Takes a slot only if one is free (raises FFmpegCapacityError
+        otherwise) and is killed when a live stream needs it.
+        """
+        self.reap()
+        if self.running() >= self.max_processes:
+            self.rejected += 1
+            raise FFmpegCapacityError(f"FFmpeg process limit reached ({self.max_processes})")
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._limit(process.pid)
+        self.spawned += 1
+        self.downloads[process.pid] = process
+        try:
+            return await process.wait()
+        finally:
+            self.downloads.pop(process.pid, None)
+            if process.returncode is None:
+                process.kill()  # Tarea cancelada
+
+    def promote(self, source):
+        """A warm spare is about to play: it no longer counts as a spare"""
+        source.spare = False
+        process = getattr(source, '_process', None)
+        entry = self.processes.get(process.pid) if process else None
+        if entry:
+            entry['spare'] = False
+
+    def release(self, process):
+        """Stop accounting for ``process``; its CPU time is added to the totals"""
+        if self.processes.pop(process.pid, None) is None:
+            return
+        cpu = process_cpu_seconds(process.pid)
+        self.finished += 1
+        if cpu is not None:
+            self.finished_cpu_seconds += cpu
+
+    def _kill(self, process):
+        self.release(process)
+        try:
+            process.kill()
+            process.wait(timeout=1)
+        except Exception as e:
+            print(f"Error killing FFmpeg process {process.pid}: {e}")
+
+    def reap(self):
+        """Release exited processes and kill the ones whose source was dropped without cleanup"""
+        for entry in list(self.processes.values()):
+            process = entry['process']
+            if process.poll() is not None:
+                self.release(process)  # Terminó solo; su salida puede quedar aún en el pipe
+            elif entry['source']() is None:
+                self._kill(process)
+                self.reaped += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            self.reap()
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        for entry in list(self.processes.values()):
+            self._kill(entry['process'])
+        for process in list(self.downloads.values()):
+            process.kill()
+        self.downloads.clear()
+
+    def stats(self):
+        now = time.monotonic()
+        processes = []
+        # release() se llama también desde el hilo de audio de discord.py: recorrer una copia
+        for pid, entry in list(self.processes.items()):
+            processes.append({
+                'pid': pid,
+                'guild_id': entry['guild_id'],
+                'profile': entry['profile'],
+                'quality': entry['quality'],
+                'spare': entry['spare'],
+                'age': now - entry['started_at'],
+                'cpu_seconds': process_cpu_seconds(pid),
+            })
+        spares = sum(process['spare'] for process in processes)
+        return {
+            'running': len(processes),
+            'live': len(processes) - spares,
+            'spares': spares,
+            'downloads': len(self.downloads),
+            'max_processes': self.max_processes,
+            'spawned': self.spawned,
+            'rejected': self.rejected,
+            'reclaimed': self.reclaimed,
+            'reaped': self.reaped,
+            'cpu_seconds': sum(process['cpu_seconds'] or 0.0 for process in processes),
+            'finished_cpu_seconds': self.finished_cpu_seconds,
+            'processes': processes,
+        }
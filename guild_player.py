@@ -0,0 +1,124 @@
+import asyncio
+import os
+
+from ffmpeg_supervisor import FFmpegCapacityError
+from metrics import PLAYBACK_ERRORS, PLAYER_TRANSITIONS
+
+PLAYER_BACKOFF = float(os.getenv("PLAYER_BACKOFF", "0.5"))
+PLAYER_MAX_BACKOFF = float(os.getenv("PLAYER_MAX_BACKOFF", "10"))
+
+
+class GuildPlayer:
+    """The playback loop of one guild, running as its own task.
+
+    Each iteration starts the head of the queue and waits on ``track_done``,
+    which discord.py's audio thread sets through ``call_soon_threadsafe``
+    when the track ends or is skipped; the audio thread never waits on the
+    event loop. A track that fails to start is reported and the loop moves
+    on after an exponential backoff, so a run of broken songs neither grows
+    the stack nor hammers YouTube. Hitting the FFmpeg process cap is not a
+    broken track: the song stays at the head of the queue and the loop
+    retries it with the same backoff. The loop ends when the queue runs out
+    or the voice connection is gone.
+
+    States: idle -> preparing -> playing -> preparing ... -> stopped, with
+    ``backoff`` after a failure. Every transition is counted in
+    ``musicbot_player_transitions_total``.
+    """
+
+    def __init__(self, player, guild_id, ctx):
+        self.player = player
+        self.guild_id = guild_id
+        self.ctx = ctx
+        self.state = 'idle'
+        self.track_done = asyncio.Event()
+        self.task = None
+        self.failures = 0
+        self.capacity_waits = 0  # reintentos seguidos por falta de procesos FFmpeg
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def set_state(self, state):
+        if state != self.state:
+            PLAYER_TRANSITIONS.inc(state=state)
+            self.state = state
+
+    def start(self, ctx):
+        """Run the loop if it isn't already; later commands only refresh the reply channel"""
+        self.ctx = ctx
+        if not self.running:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def after_callback(self, prefetcher):
+        """``after`` for ``VoiceClient.play``; runs on the audio thread and only hands off to the loop"""
+        loop = asyncio.get_running_loop()
+
+        def after_playing(error):
+            prefetcher.track_ended()
+            loop.call_soon_threadsafe(self.track_finished, error)
+
+        return after_playing
+
+    def track_finished(self, error):
+        if error:
+            PLAYBACK_ERRORS.inc()
+            print(f"Error playing audio in guild {self.guild_id}: {error}")
+        self.track_done.set()
+
+    async def run(self):
+        try:
+            while True:
+                vc = self.ctx.voice_client
+                if not vc or not vc.is_connected():
+                    self.set_state('stopped')
+                    return
+
+                if not self.player.get_queue(self.guild_id):
+                    self.set_state('stopped')
+                    await self.ctx.send("🎵 No more songs in queue")
+                    await self.player.stop_and_disconnect(self.guild_id)
+                    return
+
+                self.set_state('preparing')
+                self.track_done.clear()
+                try:
+                    song = await self.player.start_track(self.ctx, self.after_callback)
+                except FFmpegCapacityError:
+                    self.capacity_waits += 1
+                    delay = min(PLAYER_MAX_BACKOFF, PLAYER_BACKOFF * 2 ** min(self.capacity_waits - 1, 10))
+                    self.set_state('backoff')
+                    if self.capacity_waits == 1:
+                        await self.ctx.send("⏳ The bot is busy right now, the next song will start as soon as it can")
+                    await asyncio.sleep(delay)
+                    continue
+                except Exception as e:
+                    self.failures += 1
+                    PLAYBACK_ERRORS.inc()
+                    print(f"Error starting a track in guild {self.guild_id}: {e}")
+                    delay = min(PLAYER_MAX_BACKOFF, PLAYER_BACKOFF * 2 ** (self.failures - 1))
+                    self.set_state('backoff')
+                    await self.player.error_handler(self.ctx, e)
+                    await asyncio.sleep(delay)
+                    continue
+                if song is None:
+                    continue  # Desconectado mientras se preparaba: la vuelta siguiente se detiene
+
+                self.failures = 0
+                self.capacity_waits = 0
+                self.set_state('playing')
+                await self.track_done.wait()
+        except asyncio.CancelledError:
+            self.set_state('stopped')
+
+    def cancel(self):
+        if self.running:
+            self.task.cancel()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'capacity_waits': self.capacity_waits,
+        }
@@ -0,0 +1,244 @@
+import random
+
+
+class _Node:
+    __slots__ = ('value', 'priority', 'size', 'left', 'right')
+
+    def __init__(self, value, priority):
+        self.value = value
+        self.priority = priority
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node, index):
+    """Split into (first ``index`` items, the rest)"""
+    if node is None:
+        return None, None
+    if _size(node.left) >= index:
+        left, node.left = _split(node.left, index)
+        _update(node)
+        return left, node
+    node.right, right = _split(node.right, index - _size(node.left) - 1)
+    _update(node)
+    return node, right
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _build(values):
+    """Build a treap from ``values`` in order in O(n) (Cartesian tree over random priorities)"""
+    stack = []
+    for value in values:
+        node = _Node(value, random.random())
+        last = None
+        while stack and stack[-1].priority < node.priority:
+            last = stack.pop()
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    if not stack:
+        return None
+
+    # Recalcular tamaños en post-orden sin recursión
+    root = stack[0]
+    pending = [(root, False)]
+    while pending:
+        node, children_done = pending.pop()
+        if children_done:
+            _update(node)
+            continue
+        pending.append((node, True))
+        if node.left:
+            pending.append((node.left, False))
+        if node.right:
+            pending.append((node.right, False))
+    return root
+
+
+def track_identity(track):
+    """Key used to spot duplicate tracks: the Spotify id, else the YouTube page, else the title"""
+    # El id de Spotify va primero: una copia ya resuelta y otra aún perezosa de la misma canción coinciden
+    return track.spotify_id or track.webpage_url or track.title
+
+
+class GuildQueue:
+    """A guild's play queue, stored as an implicit treap.
+
+    Indexing, insert, remove, move, jump and slicing are O(log n) (plus the
+    size of the slice). Shuffle and dedup touch every entry and are O(n).
+    Supports the ``deque`` operations the player already relies on
+    (``append``, ``popleft``, ``clear``, ``len``, iteration, ``queue[0]``).
+    """
+
+    def __init__(self, items=(), on_change=None):
+        self.root = _build(items)
+        self.on_change = on_change  # llamado tras cada modificación (p. ej. para persistir la cola)
+
+    def _changed(self):
+        if self.on_change:
+            self.on_change()
+
+    def __len__(self):
+        return _size(self.root)
+
+    def __bool__(self):
+        return self.root is not None
+
+    def __iter__(self):
+        stack = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.value
+            node = node.right
+
+    def _index(self, index):
+        length = len(self)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("queue index out of range")
+        return index
+
+    def __getitem__(self, index):
+        index = self._index(index)
+        node = self.root
+        while True:
+            left_size = _size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.value
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    def append(self, track):
+        self.root = _merge(self.root, _Node(track, random.random()))
+        self._changed()
+
+    def extend(self, tracks):
+        self.root = _merge(self.root, _build(tracks))
+        self._changed()
+
+    def insert(self, index, track):
+        """Insert ``track`` before position ``index`` (clamped like ``list.insert``)"""
+        index = max(0, min(len(self), index if index >= 0 else len(self) + index))
+        left, right = _split(self.root, index)
+        self.root = _merge(_merge(left, _Node(track, random.random())), right)
+        self._changed()
+
+    def pop(self, index=-1):
+        index = self._index(index)
+        left, rest = _split(self.root, index)
+        node, right = _split(rest, 1)
+        self.root = _merge(left, right)
+        self._changed()
+        return node.value
+
+    def popleft(self):
+        if self.root is None:
+            raise IndexError("pop from an empty queue")
+        return self.pop(0)
+
+    def remove(self, index):
+        """Remove and return the track at ``index``"""
+        return self.pop(index)
+
+    def move(self, source, destination):
+        """Move the track at ``source`` so it ends up at ``destination``"""
+        track = self.pop(source)
+        self.insert(destination, track)
+        return track
+
+    def jump(self, index):
+        """Drop every track before ``index`` so it becomes the head; returns how many were dropped"""
+        index = self._index(index)
+        _, self.root = _split(self.root, index)
+        self._changed()
+        return index
+
+    def slice(self, start, stop):
+        """Tracks in ``[start, stop)``, for paginated views"""
+        start = max(0, start)
+        stop = min(len(self), stop)
+        if start >= stop:
+            return []
+
+        # Bajar hasta ``start`` guardando los ancestros pendientes y seguir en orden
+        stack = []
+        node = self.root
+        index = start
+        while node:
+            left_size = _size(node.left)
+            if index < left_size:
+                stack.append(node)
+                node = node.left
+            elif index == left_size:
+                stack.append(node)
+                break
+            else:
+                index -= left_size + 1
+                node = node.right
+
+        items = []
+        while stack and len(items) < stop - start:
+            node = stack.pop()
+            items.append(node.value)
+            node = node.right
+            while node:
+                stack.append(node)
+                node = node.left
+        return items
+
+    def shuffle(self):
+        items = list(self)
+        random.shuffle(items)
+        self.root = _build(items)
+        self._changed()
+
+    def dedup(self, key=track_identity):
+        """Remove later duplicates of a track; returns how many were removed"""
+        seen = set()
+        kept = []
+        for track in self:
+            identity = key(track)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            kept.append(track)
+        removed = len(self) - len(kept)
+        if removed:
+            self.root = _build(kept)
+            self._changed()
+        return removed
+
+    def clear(self):
+        self.root = None
+        self._changed()
@@ -11,9 +11,10 @@ intents.guilds = True
 intents.message_content = True
 intents.voice_states = True
 
-class DiscordBot(commands.Bot):
-    def __init__(self):
-        super().__init__(command_prefix="!", intents=intents)
+class DiscordBot(commands.AutoShardedBot):
+    def __init__(self, shard_ids=None, shard_count=None):
+        # Sin argumentos Discord decide cuántos shards usar; cluster.py reparte rangos entre procesos
+        super().__init__(command_prefix="!", intents=intents, shard_ids=shard_ids, shard_count=shard_count)
 
     async def setup_hook(self):
         try:
@@ -22,17 +23,29 @@ class DiscordBot(commands.Bot):
         except Exception as e:
             print(f"Error loading music extension: {e}")
 
-bot = DiscordBot()
-
-@bot.event
-async def on_ready():
-    print(f"Bot connected as {bot.user}")
-    print(f"Bot ID: {bot.user.id}")
-    print("Ready to operate.")
+    async def on_ready(self):
+        print(f"Bot connected as {self.user}")
+        print(f"Bot ID: {self.user.id}")
+        if self.shard_ids:
+            print(f"Shards: {self.shard_ids} of {self.shard_count}")
+        print("Ready to operate.")
+
+    def shard_stats(self):
+        """Latency, guild and voice client counts for each shard this process owns"""
+        stats = {
+            shard_id: {'latency': shard.latency, 'guilds': 0, 'voice_clients': 0}
+            for shard_id, shard in self.shards.items()
+        }
+        for guild in self.guilds:
+            if guild.shard_id in stats:
+                stats[guild.shard_id]['guilds'] += 1
+                if guild.voice_client:
+                    stats[guild.shard_id]['voice_clients'] += 1
+        return stats
 
 if __name__ == "__main__":
     async def main():
-        async with bot:
+        async with DiscordBot() as bot:
             await bot.start(BOT_TOKEN)
 
     import asyncio
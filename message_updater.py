@@ -0,0 +1,93 @@
+import asyncio
+import os
+from collections import OrderedDict
+
+import discord
+
+from playlist_loader import TokenBucket
+
+# Discord permite unas 5 ediciones cada 5 s por canal
+EDIT_RATE = float(os.getenv("EDIT_RATE", "1"))
+EDIT_BURST = int(os.getenv("EDIT_BURST", "5"))
+
+
+class MessageUpdater:
+    """Edits status messages in place, coalescing edits and pacing them per route.
+
+    ``edit(message, **fields)`` only records the latest wanted state of a
+    message; a worker per channel (the rate-limit bucket Discord applies to
+    message edits) applies pending edits through a token bucket. Edits
+    requested while one is waiting are merged, so a message that changes ten
+    times in a second costs one or two REST calls and the last state always
+    wins. ``on_missing(message)`` is called when a message turns out to be
+    deleted, so its owner can stop editing it.
+    """
+
+    def __init__(self, rate=EDIT_RATE, burst=EDIT_BURST, on_missing=None):
+        self.rate = rate
+        self.burst = burst
+        self.on_missing = on_missing
+        self.pending = {}  # channel id -> OrderedDict(message id -> (mensaje, campos))
+        self.buckets = {}  # channel id -> TokenBucket
+        self.workers = {}  # channel id -> tarea
+        self.requested = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def edit(self, message, **fields):
+        """Schedule ``message.edit(**fields)``; merges with an edit still waiting for that message"""
+        self.requested += 1
+        route = message.channel.id
+        pending = self.pending.setdefault(route, OrderedDict())
+        if message.id in pending:
+            self.coalesced += 1
+            fields = {**pending[message.id][1], **fields}
+        pending[message.id] = (message, fields)
+
+        worker = self.workers.get(route)
+        if worker is None or worker.done():
+            self.workers[route] = asyncio.get_running_loop().create_task(self._drain(route))
+
+    def discard(self, message):
+        """Forget pending edits for a message that is about to be deleted"""
+        self.pending.get(message.channel.id, {}).pop(message.id, None)
+
+    async def _drain(self, route):
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            bucket = self.buckets[route] = TokenBucket(self.rate, self.burst)
+        pending = self.pending[route]
+        while pending:
+            await bucket.acquire()
+            if not pending:
+                break
+            # Lo que llegue mientras se espera el token se fusiona en esta misma edición
+            _, (message, fields) = pending.popitem(last=False)
+            try:
+                await message.edit(**fields)
+                self.applied += 1
+            except discord.NotFound:
+                self.failed += 1
+                if self.on_missing:
+                    self.on_missing(message)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error editing message {message.id}: {e}")
+        self.pending.pop(route, None)
+
+    async def flush(self):
+        """Wait until every pending edit has been applied"""
+        workers = [worker for worker in self.workers.values() if not worker.done()]
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        self.workers.clear()
+
+    def stats(self):
+        return {
+            'requested': self.requested,
+            'applied': self.applied,
+            'coalesced': self.coalesced,
+            'failed': self.failed,
+            'pending': sum(len(pending) for pending in self.pending.values()),
+        }
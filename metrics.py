@@ -0,0 +1,287 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as Tally
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = sin endpoint HTTP
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+
+# Segundos: de 1 ms a 30 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values`` (0.0 for an empty sample)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class CounterMetric:
+    """Monotonic counter, optionally split by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}  # tupla de valores de etiqueta -> total
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(tuple(labels.get(name, '') for name in self.labelnames), 0)
+
+    def samples(self):
+        for key, value in self.values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class HistogramMetric:
+    """Fixed-bucket histogram; safe to observe from the voice threads"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the ``fraction`` quantile (0.0 when empty)"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f"{self.name}_bucket", {'le': repr(bound)}, cumulative
+        yield f"{self.name}_bucket", {'le': '+Inf'}, self.count
+        yield f"{self.name}_sum", {}, self.sum
+        yield f"{self.name}_count", {}, self.count
+
+
+class Registry:
+    """Metrics plus collector callbacks, rendered in the Prometheus text format.
+
+    Collectors are called at scrape time and return
+    ``[(name, kind, help, [(labels, value), ...]), ...]``; they expose
+    values that already live elsewhere (cache stats, voice clients) without
+    updating a metric on every change.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = CounterMetric(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS):
+        metric = HistogramMetric(name, help, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{format_labels(labels)} {value}")
+        for collector in self.collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+EXTRACTION_SECONDS = REGISTRY.histogram(
+    'musicbot_extraction_seconds', "yt-dlp lookup time, queueing included")
+FIRST_AUDIO_SECONDS = REGISTRY.histogram(
+    'musicbot_first_audio_seconds', "From a play request on an idle player to the first audio packet")
+TRANSITION_GAP_SECONDS = REGISTRY.histogram(
+    'musicbot_transition_gap_seconds', "From the end of a track to the first packet of the next")
+FFMPEG_SPAWN_SECONDS = REGISTRY.histogram(
+    'musicbot_ffmpeg_spawn_seconds', "Time to start an FFmpeg process")
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    'musicbot_event_loop_lag_seconds', "How late the event loop runs a scheduled wake-up")
+VOICE_JITTER_SECONDS = REGISTRY.histogram(
+    'musicbot_voice_send_jitter_seconds', "Deviation of the audio packet interval from 20 ms",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25))
+TRACKS_PLAYED = REGISTRY.counter('musicbot_tracks_played_total', "Tracks started")
+PLAYBACK_ERRORS = REGISTRY.counter('musicbot_playback_errors_total', "Errors while starting or playing a track")
+PLAYER_TRANSITIONS = REGISTRY.counter(
+    'musicbot_player_transitions_total', "Guild playback loop state changes", labelnames=('state',))
+PREFETCH_WARM_STARTS = REGISTRY.counter(
+    'musicbot_prefetch_warm_starts_total', "Tracks started with (hit) or without (miss) a pre-spawned FFmpeg process",
+    labelnames=('result',))
+QUALITY_CHANGES = REGISTRY.counter(
+    'musicbot_quality_changes_total', "Guild quality tier changes at track boundaries", labelnames=('tier',))
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag by checking how late a periodic sleep wakes up"""
+
+    def __init__(self, histogram=LOOP_LAG_SECONDS, interval=0.5):
+        self.histogram = histogram
+        self.interval = interval
+        self.task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.histogram.observe(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+
+class MetricsServer:
+    """Serves ``registry.render()`` at ``/metrics`` on a local port"""
+
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.runner = None
+
+    async def start(self):
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+class SamplingProfiler:
+    """Samples one thread's stack every ``interval`` seconds from a background thread.
+
+    Stacks are counted in collapsed form (``file:function;file:function``),
+    which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.stacks = Tally()
+        self.samples = 0
+        self.thread = None
+        self.stopping = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _sample(self, thread_id):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                return
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self, thread_id=None):
+        """Start sampling ``thread_id`` (default: the calling thread, i.e. the event loop)"""
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self.stopping.clear()
+        self.thread = threading.Thread(
+            target=self._sample, args=(thread_id or threading.get_ident(),), name='profiler', daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def top(self, limit=10):
+        """Most sampled innermost functions as (name, share of samples)"""
+        leaves = Tally()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [(name, count / self.samples) for name, count in leaves.most_common(limit)] if self.samples else []
+
+    def dump(self, path):
+        """Write the collapsed stacks to ``path``"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
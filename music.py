@@ -1,28 +1,39 @@
 import discord
 from discord.ext import commands
-import yt_dlp
 import asyncio
-from collections import deque
 from discord.ui import Button, View
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 from datetime import datetime
 import os
+import time
+from collections import Counter
 from dotenv import load_dotenv # type: ignore
+from resolver_cache import cache_from_env, normalize_query
+from audio_cache import AUDIO_CACHE_MMAP, MappedOpusAudio, audio_cache_from_env
+from prefetch import Prefetcher
+from extractor_pool import ExtractorPool
+from track import Track
+from guild_queue import GuildQueue
+from scheduler import DeadlineScheduler
+from state_store import StateStore, backend_from_env
+from playlist_loader import PLAYLIST_RATE, PlaylistPipeline
+from spotify_client import SpotifyClient
+from track_matcher import MATCH_CANDIDATES, MIN_SCORE, mapping_index_from_env, pick_best
+from ffmpeg_supervisor import FFmpegCapacityError, FFmpegSupervisor, SupervisedOpusAudio, SupervisedPCMAudio
+from guild_player import GuildPlayer
+from message_updater import MessageUpdater
+from quality import QUALITY_TIERS, QualityGovernor
+from metrics import (
+    FIRST_AUDIO_SECONDS, LOOP_LAG_SECONDS, METRICS_PORT, PLAYBACK_ERRORS, PREFETCH_WARM_STARTS, REGISTRY,
+    TRACKS_PLAYED, TRANSITION_GAP_SECONDS, VOICE_JITTER_SECONDS, LoopLagMonitor, MetricsServer, SamplingProfiler,
+)
 
 load_dotenv()
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 
-# Spotify Configuration
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-    client_id = SPOTIFY_CLIENT_ID,
-    client_secret = SPOTIFY_CLIENT_SECRET
-))
-
 # yt-dlp Configuration
 ydl_opts = {
-    'format': 'bestaudio/best',
+    'format': QUALITY_TIERS['high']['format'],  # Preferir Opus para poder copiarlo sin recodificar
     'noplaylist': True,
     'quiet': True,
     'no_warnings': True,
@@ -42,12 +53,77 @@ FFMPEG_OPTIONS = {
     'options': '-vn'
 }
 
+# Perfiles que se pueden elegir por servidor con !profile
+FFMPEG_PROFILES = {
+    'default': FFMPEG_OPTIONS,
+    'low_latency': {
+        'before_options': f"{FFMPEG_OPTIONS['before_options']} -fflags nobuffer -probesize 32k -analyzeduration 0",
+        'options': '-vn',
+    },
+    'normalized': {
+        'before_options': FFMPEG_OPTIONS['before_options'],
+        'options': '-vn -af loudnorm=I=-16:TP=-1.5:LRA=11',
+    },
+    'bass_boost': {
+        'before_options': FFMPEG_OPTIONS['before_options'],
+        'options': '-vn -af bass=g=8',
+    },
+}
+
+QUEUE_PAGE_SIZE = 10
+INACTIVITY_TIMEOUT = 180  # 3 minutos
+
+# Las playlists de Spotify se encolan solo con sus metadatos y se buscan en YouTube al acercarse a la cabeza
+LAZY_PLAYLISTS = os.getenv("LAZY_PLAYLISTS", "1") != "0"
+
+# Enviar el Opus de YouTube tal cual cuando ya viene a 48 kHz (sin decodificar a PCM ni recodificar)
+OPUS_PASSTHROUGH = os.getenv("OPUS_PASSTHROUGH", "1") != "0"
+
+
+def has_filters(ffmpeg_opts):
+    return '-af' in ffmpeg_opts.get('options', '').split()
+
+
+def is_opus_passthrough(song, ffmpeg_opts=FFMPEG_OPTIONS):
+    """True if the song's selected format can be sent to Discord without re-encoding"""
+    return OPUS_PASSTHROUGH and song.acodec == 'opus' and song.asr == 48000 and not has_filters(ffmpeg_opts)
+
+
+def encoder_options(ffmpeg_opts, encoding):
+    """Output options for an FFmpeg-side Opus encode at a quality tier's settings"""
+    return f"{ffmpeg_opts.get('options', '')} {encoding['encoder']}".strip()
+
+
+def make_stream_source(song, ffmpeg_opts, encoding=QUALITY_TIERS['high'], **supervision):
+    """Build the FFmpeg audio source for a stream URL, copying Opus when possible.
+
+    Otherwise tiers with ``encoder`` settings have FFmpeg encode Opus at the
+    ``bitrate`` of ``encoding``; the ``high`` tier hands PCM to discord.py's
+    encoder, which ``VoiceClient.play`` sets to that bitrate.
+    """
+    if is_opus_passthrough(song, ffmpeg_opts):
+        return SupervisedOpusAudio(song.url, codec='copy', **ffmpeg_opts, **supervision)
+    if encoding['encoder']:
+        return SupervisedOpusAudio(
+            song.url, bitrate=encoding['bitrate'], before_options=ffmpeg_opts.get('before_options'),
+            options=encoder_options(ffmpeg_opts, encoding), **supervision
+        )
+    return SupervisedPCMAudio(song.url, **ffmpeg_opts, **supervision)  # Cambiar de from_probe a FFmpegPCMAudio
+
 class MusicButtons(View):
+    """Playback controls shared by every now-playing message.
+
+    A single persistent instance is registered with ``bot.add_view`` (fixed
+    custom_ids, no timeout), so the buttons keep working after a restart and
+    no view is built per song. Being shared, it must not hold per-guild
+    state such as a toggled label.
+    """
+
     def __init__(self, music_player):
         super().__init__(timeout=None)
         self.music_player = music_player
 
-    @discord.ui.button(label="⏸️ Pause", style=discord.ButtonStyle.primary)
+    @discord.ui.button(label="⏯️ Pause/Resume", style=discord.ButtonStyle.primary, custom_id="music:pause")
     async def pause_button(self, interaction: discord.Interaction, button: Button):
         vc = interaction.guild.voice_client
         if not vc:
@@ -56,16 +132,12 @@ class MusicButtons(View):
 
         if vc.is_paused():
             vc.resume()
-            button.label = "⏸️ Pause"
-            await interaction.response.edit_message(view=self)
-            await interaction.followup.send("▶️ Music resumed", ephemeral=True)
+            await interaction.response.send_message("▶️ Music resumed", ephemeral=True)
         else:
             vc.pause()
-            button.label = "▶️ Resume"
-            await interaction.response.edit_message(view=self)
-            await interaction.followup.send("⏸️ Music paused", ephemeral=True)
+            await interaction.response.send_message("⏸️ Music paused", ephemeral=True)
 
-    @discord.ui.button(label="⏭️ Next", style=discord.ButtonStyle.secondary)
+    @discord.ui.button(label="⏭️ Next", style=discord.ButtonStyle.secondary, custom_id="music:skip")
     async def skip_button(self, interaction: discord.Interaction, button: Button):
         vc = interaction.guild.voice_client
         if not vc:
@@ -79,7 +151,7 @@ class MusicButtons(View):
         vc.stop()
         await interaction.response.send_message("⏭️ Skipping to next song...", ephemeral=True)
 
-    @discord.ui.button(label="⏹️ Stop", style=discord.ButtonStyle.danger)
+    @discord.ui.button(label="⏹️ Stop", style=discord.ButtonStyle.danger, custom_id="music:stop")
     async def stop_button(self, interaction: discord.Interaction, button: Button):
         vc = interaction.guild.voice_client
         if not vc:
@@ -89,166 +161,486 @@ class MusicButtons(View):
         await self.music_player.stop_and_disconnect(interaction.guild.id)
         await interaction.response.send_message("⏹️ Playback stopped", ephemeral=True)
 
+class ResumeContext:
+    """Stand-in for commands.Context when playback resumes after a restart"""
+
+    def __init__(self, guild, channel):
+        self.guild = guild
+        self.channel = channel
+        self.author = guild.me
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
+
 class MusicPlayer:
     def __init__(self, bot):
         self.bot = bot
         self.queues = {}
         self.now_playing = {}
-        self.ydl = yt_dlp.YoutubeDL(ydl_opts)
+        self.extractor = ExtractorPool()  # Instancias de YoutubeDL reutilizadas en hilos propios
         self.loading_playlists = set()
-        self.audio_cache = {}  # Nuevo: caché de audio
-        self.max_cache_size = 5  # Número máximo de entradas en caché
-        self.guild_ffmpeg_options = {}  # Configuraciones específicas por servidor
+        self.ffmpeg = FFmpegSupervisor()  # Límite global y recursos de los procesos FFmpeg
+        self.audio_cache = audio_cache_from_env(self.ffmpeg)  # Opus ya codificado de las canciones repetidas
+        self.guild_ffmpeg_options = {}  # Perfil de FFMPEG_PROFILES elegido por cada servidor
+        self.quality = QualityGovernor()  # Nivel de calidad por servidor según el canal y la carga de CPU
         self.guild_ydl_opts = {}  # Opciones de yt-dlp por servidor
+        self.resolution_cache = cache_from_env()
+        self.mappings = mapping_index_from_env()  # Spotify id / ISRC -> vídeo de YouTube ya elegido
+        self.prefetchers = {}  # Prefetcher por servidor
+        self.inactivity = DeadlineScheduler()  # Un único temporizador para todos los servidores
+        self.playing = {}  # guild_id -> (canción, instante de inicio, segundo desde el que empezó)
+        self.text_channels = {}  # Canal donde se anuncian las canciones de cada servidor
+        self.requested_at = {}  # guild_id -> instante del !play que arrancó un reproductor parado
+        self.guild_players = {}  # guild_id -> GuildPlayer (bucle de reproducción del servidor)
+        self.updater = MessageUpdater(on_missing=self.forget_message)  # Ediciones agrupadas y espaciadas por canal
+        self.buttons = None  # Vista persistente única; se crea en Music.cog_load
+        self.state = StateStore(backend_from_env(), self.snapshot)
+        # Spotify Configuration: sin conexiones hasta el primer enlace de Spotify
+        self.spotify = SpotifyClient(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET)
 
     def get_queue(self, guild_id):
         if guild_id not in self.queues:
-            self.queues[guild_id] = deque()
+            self.queues[guild_id] = GuildQueue(on_change=lambda: self.state.mark_dirty(guild_id))
         return self.queues[guild_id]
 
+    def snapshot(self, guild_id):
+        """Serializable player state for a guild, or None if there is nothing to resume"""
+        guild = self.bot.get_guild(guild_id)
+        vc = guild.voice_client if guild else None
+        queue = self.queues.get(guild_id)
+        current = self.playing.get(guild_id)
+        if not vc or (not queue and not current):
+            return None
+
+        data = {
+            'voice_channel_id': vc.channel.id,
+            'text_channel_id': self.text_channels.get(guild_id),
+            'queue': [song.to_dict() for song in queue] if queue else [],
+            'current': None,
+            'position': 0,
+            'ffmpeg_options': self.guild_ffmpeg_options.get(guild_id),
+            'ydl_opts': self.guild_ydl_opts.get(guild_id),
+        }
+        if current:
+            song, started_at, offset = current
+            data['current'] = song.to_dict()
+            data['position'] = int(offset + time.monotonic() - started_at)
+        return data
+
+    async def resume_all(self):
+        """Restore the queues saved before a restart and resume playback where it stopped"""
+        for guild_id, snapshot in (await self.state.load_all()).items():
+            guild = self.bot.get_guild(guild_id)
+            if guild is None:
+                continue  # Servidor de otro shard/proceso
+
+            voice_channel = guild.get_channel(snapshot['voice_channel_id'])
+            text_channel = guild.get_channel(snapshot['text_channel_id'] or 0)
+            if voice_channel is None or text_channel is None:
+                self.state.mark_dirty(guild_id)  # sin estado en memoria: se borra en el próximo flush
+                continue
+
+            if snapshot.get('ffmpeg_options') in FFMPEG_PROFILES:
+                self.guild_ffmpeg_options[guild_id] = snapshot['ffmpeg_options']
+            if snapshot.get('ydl_opts'):
+                self.guild_ydl_opts[guild_id] = snapshot['ydl_opts']
+
+            songs = [Track.from_dict(data) for data in snapshot['queue']]
+            if snapshot.get('current'):
+                current = Track.from_dict(snapshot['current'])
+                current.start_offset = snapshot.get('position', 0)
+                songs.insert(0, current)
+            self.get_queue(guild_id).extend(songs)
+            self.text_channels[guild_id] = text_channel.id
+
+            try:
+                await voice_channel.connect()
+                await text_channel.send("🔄 Resuming playback after a restart")
+                await self.play_next(ResumeContext(guild, text_channel))
+            except Exception as e:
+                print(f"Error resuming playback in guild {guild_id}: {e}")
+
+    def ydl_options(self, guild_id):
+        """yt-dlp options for a guild: its own if it has them, with the format of its quality tier"""
+        # Usar opciones de yt-dlp específicas del servidor si existen
+        opts = self.guild_ydl_opts.get(guild_id, ydl_opts)
+        tier = self.quality.tier(guild_id)
+        if tier == 'high':
+            return opts
+        return dict(opts, format=QUALITY_TIERS[tier]['format'])
+
+    async def extract(self, guild_id, query):
+        """Resolve a YouTube URL or search query to a video entry, using the resolution cache"""
+        ydl_opts_server = self.ydl_options(guild_id)
+        namespace = ydl_opts_server.get('format')
+        key = normalize_query(query)
+
+        cached = self.resolution_cache.get(key, namespace)
+        if cached and cached['url']:
+            return cached
+
+        if cached and cached.get('webpage_url'):
+            # Solo hace falta renovar la URL firmada, no repetir la búsqueda
+            target = cached['webpage_url']
+        elif 'youtube.com' in query or 'youtu.be' in query:
+            target = query
+        else:
+            target = f"ytsearch:{query}"
+
+        info = await self.extractor.extract_info(ydl_opts_server, target)
+
+        if 'entries' in info:
+            if not info['entries']:
+                return None
+            video = info['entries'][0]
+        else:
+            video = info  # The info is already of the video directly
+
+        record = {
+            'id': video.get('id'),
+            'url': video.get('url', video.get('formats', [{}])[0].get('url')),
+            'webpage_url': video.get('webpage_url', ''),
+            'title': video.get('title', 'Unknown Title'),
+            'thumbnail': video.get('thumbnail'),
+            'duration': video.get('duration', 0),
+            'acodec': video.get('acodec'),
+            'asr': video.get('asr'),
+        }
+        self.resolution_cache.put(key, record, record['url'], namespace)
+        return record
+
+    async def refresh_stream_url(self, guild_id, song):
+        """Resolve a lazy queue entry, or re-resolve one whose stream URL is about to expire"""
+        if not song.resolved:
+            # Entrada de Spotify sin resolver: buscarla en YouTube ahora que está cerca de sonar
+            video = await self.resolve_spotify_track(guild_id, song)
+            if not video or not video['url']:
+                raise ValueError(f"Song not found on YouTube: {song.title}")
+        elif not song.webpage_url or not self.resolution_cache.needs_refresh(song.url):
+            return song
+        else:
+            video = await self.extract(guild_id, song.webpage_url)
+
+        if video and video['url']:
+            song.set_stream(video)
+        return song
+
+    async def resolve_spotify_track(self, guild_id, song):
+        """Find the YouTube video for a Spotify-backed Track, through the mapping index when possible"""
+        started = time.perf_counter()
+        video_id = self.mappings.get(song.spotify_id, song.isrc)
+        if video_id:
+            try:
+                video = await self.extract(guild_id, f"https://www.youtube.com/watch?v={video_id}")
+            except Exception as e:
+                # Vídeo borrado o privado: yt-dlp lanza DownloadError
+                print(f"Error extracting mapped video {video_id} for {song.title}: {e}")
+                video = None
+            if video:
+                self.mappings.record(True, time.perf_counter() - started)
+                return video
+            self.mappings.forget(song.spotify_id, song.isrc)  # El vídeo ya no existe: buscar de nuevo
+
+        # Búsqueda plana de varios candidatos; solo el elegido se extrae completo
+        search_opts = dict(self.ydl_options(guild_id), extract_flat='in_playlist')
+        info = await self.extractor.extract_info(search_opts, f"ytsearch{MATCH_CANDIDATES}:{song.search_query}")
+        candidate, score = pick_best(info.get('entries', []), song.title, song.artist, song.duration)
+        if candidate is None:
+            return None
+
+        video = await self.extract(guild_id, f"https://www.youtube.com/watch?v={candidate['id']}")
+        if video and score >= MIN_SCORE:
+            self.mappings.put(song.spotify_id, song.isrc, candidate['id'], score)
+        self.mappings.record(False, time.perf_counter() - started)
+        return video
+
+    def collect_metrics(self):
+        """Gauges read from the player's components at scrape time"""
+        caches = {
+            'resolver': self.resolution_cache.stats(),
+            'mapping': self.mappings.stats(),
+            'spotify': self.spotify.stats(),
+        }
+        if self.audio_cache:
+            caches['audio'] = self.audio_cache.stats()
+        ffmpeg = self.ffmpeg.stats()
+        quality = self.quality.stats()
+        players = [player.stats() for player in self.guild_players.values()]
+        edits = self.updater.stats()
+        return [
+            ('musicbot_cache_hit_ratio', 'gauge', "Hit rate of each cache",
+             [({'cache': name}, stats['hit_rate']) for name, stats in caches.items()]),
+            ('musicbot_voice_clients', 'gauge', "Connected voice clients", [({}, len(self.bot.voice_clients))]),
+            ('musicbot_queued_tracks', 'gauge', "Tracks waiting in all queues",
+             [({}, sum(len(queue) for queue in self.queues.values()))]),
+            ('musicbot_ffmpeg_processes', 'gauge', "Running FFmpeg processes",
+             [({'role': 'live'}, ffmpeg['live']), ({'role': 'spare'}, ffmpeg['spares']),
+              ({'role': 'download'}, ffmpeg['downloads'])]),
+            ('musicbot_ffmpeg_cpu_seconds_total', 'counter', "CPU time used by FFmpeg processes",
+             [({}, ffmpeg['cpu_seconds'] + ffmpeg['finished_cpu_seconds'])]),
+            ('musicbot_extractor_in_flight', 'gauge', "yt-dlp lookups running or queued",
+             [({}, len(self.extractor.in_flight))]),
+            ('musicbot_message_edits_total', 'counter', "Status message edits requested, merged, sent and failed",
+             [({'result': result}, edits[result]) for result in ('requested', 'coalesced', 'applied', 'failed')]),
+            ('musicbot_message_edits_pending', 'gauge', "Status message edits waiting for a rate-limit token",
+             [({}, edits['pending'])]),
+            ('musicbot_inactivity_timers', 'gauge', "Guilds with an inactivity disconnect pending",
+             [({}, self.inactivity.armed())]),
+            ('musicbot_inactivity_disconnects_total', 'counter', "Inactivity deadlines that fired",
+             [({}, self.inactivity.fired)]),
+            ('musicbot_players', 'gauge', "Guild playback loops by state",
+             [({'state': state}, count) for state, count in Counter(player['state'] for player in players).items()]),
+            ('musicbot_player_retries', 'gauge', "Consecutive retries of the current track in all playback loops",
+             [({'reason': 'error'}, sum(player['failures'] for player in players)),
+              ({'reason': 'capacity'}, sum(player['capacity_waits'] for player in players))]),
+            ('musicbot_host_cpu_load', 'gauge', "Host CPU utilisation driving the quality tiers",
+             [({}, quality['load'])]),
+            ('musicbot_quality_guilds', 'gauge', "Guilds at each quality tier",
+             [({'tier': tier}, count) for tier, count in quality['guilds'].items()]),
+        ] + self.collect_audio_store()
+
+    def collect_audio_store(self):
+        if not self.audio_cache:
+            return []
+        store = self.audio_cache.stats()
+        return [
+            ('musicbot_audio_store_bytes', 'gauge', "Bytes of downloaded audio on disk", [({}, store['bytes'])]),
+            ('musicbot_audio_store_files', 'gauge', "Files and songs in the audio store",
+             [({'kind': 'objects'}, store['objects']), ({'kind': 'songs'}, store['entries'])]),
+            ('musicbot_audio_store_events_total', 'counter', "Audio store downloads, evictions and failed checks",
+             [({'event': event}, store[event]) for event in ('stored', 'deduplicated', 'evicted', 'corrupt')]),
+        ]
+
+    def get_prefetcher(self, guild_id):
+        if guild_id not in self.prefetchers:
+            self.prefetchers[guild_id] = Prefetcher(self, guild_id)
+        return self.prefetchers[guild_id]
+
+    def build_source(self, guild_id, song, spare=False):
+        """Create a fresh audio source for a song, from the audio cache when possible.
+
+        ``spare`` marks a source spawned ahead of time by the prefetcher. The
+        guild's current quality tier decides the encoder settings.
+        """
+        # Usar el perfil del servidor si tiene uno
+        profile = self.guild_ffmpeg_options.get(guild_id, 'default')
+        ffmpeg_opts = FFMPEG_PROFILES[profile]
+        tier = self.quality.tier(guild_id)
+        encoding = self.quality.encoding(guild_id)
+        supervision = {
+            'supervisor': self.ffmpeg, 'guild_id': guild_id, 'profile': profile, 'quality': tier, 'spare': spare,
+        }
+
+        if song.start_offset:
+            # Reanudar en el punto donde se quedó antes del reinicio
+            before = ffmpeg_opts.get('before_options', '')
+            ffmpeg_opts = dict(ffmpeg_opts, before_options=f"-ss {song.start_offset} {before}".strip())
+
+        # Verificar si la canción está en caché
+        cached_path = self.audio_cache.get(song) if self.audio_cache else None
+        if cached_path:
+            # Cada acierto crea una fuente nueva: un proceso FFmpeg solo se puede reproducir una vez
+            seek = f"-ss {song.start_offset}" if song.start_offset else None
+            if has_filters(ffmpeg_opts):
+                # Los filtros del perfil obligan a recodificar
+                options = encoder_options(ffmpeg_opts, encoding) if encoding['encoder'] else ffmpeg_opts['options']
+                return SupervisedOpusAudio(
+                    cached_path, bitrate=encoding['bitrate'], before_options=seek, options=options, **supervision
+                )
+            if AUDIO_CACHE_MMAP:
+                # Sin filtros los paquetes Opus del fichero se envían tal cual, sin lanzar FFmpeg
+                return MappedOpusAudio(cached_path, start=song.start_offset, quality=tier, spare=spare)
+            return SupervisedOpusAudio(cached_path, codec='copy', before_options=seek, **supervision)
+
+        if self.audio_cache and self.audio_cache.record_play(song):
+            # Se descarga la canción entera, no desde el punto en que se reanuda
+            self.bot.loop.create_task(self.audio_cache.store(
+                song, song.url, FFMPEG_OPTIONS['before_options'], copy=song.acodec == 'opus' and song.asr == 48000
+            ))
+        return make_stream_source(song, ffmpeg_opts, encoding, **supervision)
+
     async def stop_and_disconnect(self, guild_id):
         if guild_id in self.queues:
             self.queues[guild_id].clear()
+
+        if guild_id in self.prefetchers:
+            self.prefetchers.pop(guild_id).cancel()
+
+        self.playing.pop(guild_id, None)
+        message = self.now_playing.pop(guild_id, None)
+        if message:
+            self.updater.discard(message)  # La próxima sesión anuncia con un mensaje nuevo
+        self.quality.forget(guild_id)
+        self.state.mark_dirty(guild_id)
         
         vc = self.bot.get_guild(guild_id).voice_client
         if vc:
             await vc.disconnect()
             
-        # Cancelar cualquier tarea de inactividad
-        if hasattr(self, f'inactivity_task_{guild_id}'):
-            task = getattr(self, f'inactivity_task_{guild_id}')
-            if not task.done():
-                task.cancel()
+        # Cancelar cualquier temporizador de inactividad
+        self.inactivity.cancel(guild_id)
 
     def reset_inactivity_timer(self, guild_id):
         """Reinicia el temporizador de inactividad"""
-        if hasattr(self, f'inactivity_task_{guild_id}'):
-            task = getattr(self, f'inactivity_task_{guild_id}')
-            if not task.done():
-                task.cancel()
-                
-        task = self.bot.loop.create_task(self.disconnect_after_inactivity(guild_id, 180))  # 3 minutos
-        setattr(self, f'inactivity_task_{guild_id}', task)
+        self.inactivity.arm(guild_id, INACTIVITY_TIMEOUT, lambda: self.disconnect_after_inactivity(guild_id))
         
-    async def disconnect_after_inactivity(self, guild_id, timeout):
+    async def disconnect_after_inactivity(self, guild_id):
         """Desconecta el bot después de cierto tiempo de inactividad"""
-        try:
-            await asyncio.sleep(timeout)
-            guild = self.bot.get_guild(guild_id)
-            if guild and guild.voice_client:
-                if not guild.voice_client.is_playing():
-                    await self.stop_and_disconnect(guild_id)
-                    channel = next((ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages), None)
-                    if channel:
-                        await channel.send("👋 Disconnected due to inactivity")
-        except asyncio.CancelledError:
-            pass
+        guild = self.bot.get_guild(guild_id)
+        if guild and guild.voice_client:
+            if not guild.voice_client.is_playing():
+                await self.stop_and_disconnect(guild_id)
+                channel = next((ch for ch in guild.text_channels if ch.permissions_for(guild.me).send_messages), None)
+                if channel:
+                    await channel.send("👋 Disconnected due to inactivity")
+
+    def get_guild_player(self, guild_id, ctx):
+        if guild_id not in self.guild_players:
+            self.guild_players[guild_id] = GuildPlayer(self, guild_id, ctx)
+        return self.guild_players[guild_id]
 
     async def play_next(self, ctx):
+        """Make sure the guild's playback loop is running; it plays the queue until it runs out"""
+        self.get_guild_player(ctx.guild.id, ctx).start(ctx)
+
+    async def start_track(self, ctx, after_callback):
+        """Start the head of the queue and announce it; returns the song.
+
+        Returns None without playing if the voice connection went away while
+        the stream was being resolved. ``after_callback(prefetcher)`` builds
+        the ``after`` hook for ``VoiceClient.play``. Called only from the
+        guild's GuildPlayer loop.
+        """
         guild_id = ctx.guild.id
         queue = self.get_queue(guild_id)
-        
-        if not queue:
-            await ctx.send("🎵 No more songs in queue")
-            await self.stop_and_disconnect(guild_id)
-            return
+        song = queue.popleft()
+        next_song = queue[0] if queue else None
+
+        # La calidad solo cambia entre canciones: el nivel según la carga, el bitrate limitado por el canal
+        tier = self.quality.update(guild_id, ctx.voice_client.channel.bitrate)
 
+        # El prefetcher ya puede tener el proceso FFmpeg de esta canción arrancado
+        prefetcher = self.get_prefetcher(guild_id)
+        source = prefetcher.take(song)
+        if source is not None and source.quality != tier:
+            source.cleanup()  # Preparada con otro nivel de calidad
+            source = None
+        if source is None:
+            song = await self.refresh_stream_url(guild_id, song)
+            try:
+                source = self.build_source(guild_id, song)
+            except FFmpegCapacityError:
+                queue.insert(0, song)  # Sin hueco para FFmpeg: la canción vuelve a la cabeza y espera
+                raise
+
+        # Resolver la canción puede tardar segundos: Stop o la inactividad pueden haber desconectado
         if not ctx.voice_client or not ctx.voice_client.is_connected():
-            return
+            source.cleanup()
+            return None
+
+        requested_at = self.requested_at.pop(guild_id, None)
+        ended_at = prefetcher.track_ended_at
+
+        def on_first_packet(now):
+            if requested_at is not None:
+                FIRST_AUDIO_SECONDS.observe(now - requested_at)
+            elif ended_at is not None:
+                TRANSITION_GAP_SECONDS.observe(now - ended_at)
+
+        source.on_first_packet = on_first_packet
 
+        # Reiniciar el timer de inactividad
+        self.reset_inactivity_timer(guild_id)
+
+        # Reproducir audio
+        # El bitrate solo se usa si discord.py codifica (fuentes PCM)
+        bitrate = self.quality.encoding(guild_id)['bitrate']
+        ctx.voice_client.play(source, after=after_callback(prefetcher), bitrate=bitrate)
+        prefetcher.track_started(song, ctx.voice_client)
+        TRACKS_PLAYED.inc()
+        self.playing[guild_id] = (song, time.monotonic(), song.start_offset)
+        song.start_offset = 0
+        self.text_channels[guild_id] = ctx.channel.id
+        self.state.mark_dirty(guild_id)
+
+        # La canción ya suena: un fallo al anunciarla no debe contar como fallo de reproducción
         try:
-            song = queue.popleft()
-            next_song = queue[0] if queue else None
-            
-            # Verificar si la canción está en caché
-            cache_key = song['url']
-            if cache_key in self.audio_cache:
-                source = self.audio_cache[cache_key]
-            else:
-                # Usar opciones específicas del servidor si existen
-                ffmpeg_opts = self.guild_ffmpeg_options.get(guild_id, FFMPEG_OPTIONS)
-                source = discord.FFmpegPCMAudio(song['url'], **ffmpeg_opts)  # Cambiar de from_probe a FFmpegPCMAudio
-                # Agregar a caché si no está llena
-                if len(self.audio_cache) < self.max_cache_size:
-                    self.audio_cache[cache_key] = source
+            await self.announce_now_playing(ctx, song, next_song)
+        except Exception as e:
+            print(f"Error announcing song: {e}")
+        return song
 
+    async def announce_now_playing(self, ctx, song, next_song):
+        guild_id = ctx.guild.id
+
+        # Create embed with clickable title
+        embed = discord.Embed(color=discord.Color.blurple())
+        
+        # Now Playing title with clickable link
+        if song.webpage_url:
+            song_title = f"[{song.title}]({song.webpage_url})"
+        else:
+            song_title = song.title
             
-            def after_playing(error):
-                if error:
-                    print(f"Error playing audio: {error}")
-                
-                # Usar run_coroutine_threadsafe correctamente
-                coro = self.play_next(ctx)
-                fut = asyncio.run_coroutine_threadsafe(coro, self.bot.loop)
-                
-                try:
-                    fut.result()
-                except Exception as e:
-                    print(f"Error in future: {e}")
-            
-            # Reiniciar el timer de inactividad
-            self.reset_inactivity_timer(guild_id)
-            
-            # Reproducir audio
-            ctx.voice_client.play(source, after=after_playing)
-            
-            # Create embed with clickable title
-            embed = discord.Embed(color=discord.Color.blurple())
-            
-            # Now Playing title with clickable link
-            if 'webpage_url' in song:
-                song_title = f"[{song['title']}]({song['webpage_url']})"
+        embed.add_field(
+            name="Now Playing 🎵",
+            value=song_title,
+            inline=False
+        )
+        
+        # Song duration formatting
+        duration_text = ""
+        if song.duration:
+            minutes = song.duration // 60
+            seconds = song.duration % 60
+            duration_text = f"Length: {minutes}:{seconds:02d}\n"
+        
+        # Requester
+        requester_text = f"Requested by: {ctx.author.name}\n"
+        
+        # Next song
+        next_song_text = ""
+        if next_song:
+            # Also make the next title clickable if URL is available
+            if next_song.webpage_url:
+                next_song_text = f"Up Next: [{next_song.title}]({next_song.webpage_url})"
             else:
-                song_title = song['title']
-                
-            embed.add_field(
-                name="Now Playing 🎵",
-                value=song_title,
-                inline=False
-            )
-            
-            # Song duration formatting
-            duration_text = ""
-            if 'duration' in song:
-                minutes = song['duration'] // 60
-                seconds = song['duration'] % 60
-                duration_text = f"Length: {minutes}:{seconds:02d}\n"
-            
-            # Requester
-            requester_text = f"Requested by: {ctx.author.name}\n"
-            
-            # Next song
-            next_song_text = ""
-            if next_song:
-                # Also make the next title clickable if URL is available
-                if 'webpage_url' in next_song:
-                    next_song_text = f"Up Next: [{next_song['title']}]({next_song['webpage_url']})"
-                else:
-                    next_song_text = f"Up Next: {next_song['title']}"
-            
-            # Combine all info in a single field
-            embed.add_field(
-                name="",
-                value=f"{duration_text}{requester_text}{next_song_text}".strip(),
-                inline=False
-            )
-            
-            # Set thumbnail if available
-            if song.get('thumbnail'):
-                embed.set_thumbnail(url=song['thumbnail'])
+                next_song_text = f"Up Next: {next_song.title}"
+        
+        # Combine all info in a single field
+        embed.add_field(
+            name="",
+            value=f"{duration_text}{requester_text}{next_song_text}".strip(),
+            inline=False
+        )
+        
+        # Set thumbnail if available
+        if song.thumbnail:
+            embed.set_thumbnail(url=song.thumbnail)
 
-            if guild_id in self.now_playing:
-                try:
-                    await self.now_playing[guild_id].delete()
-                except:
-                    pass
+        # Editar el mensaje existente en lugar de borrarlo y mandar otro
+        message = self.now_playing.get(guild_id)
+        if message and message.channel.id == ctx.channel.id:
+            self.updater.edit(message, embed=embed)
+            return
 
-            self.now_playing[guild_id] = await ctx.send(embed=embed, view=MusicButtons(self))
+        if message:
+            self.updater.discard(message)
+            try:
+                await message.delete()
+            except:
+                pass
+        self.now_playing[guild_id] = await ctx.send(embed=embed, view=self.buttons)
 
-        except Exception as e:
-            print(f"Error in play_next: {e}")
-            await self.error_handler(ctx, e)
-            await self.play_next(ctx)
+    def forget_message(self, message):
+        """A status message was deleted: the next announcement sends a new one"""
+        for guild_id, current in list(self.now_playing.items()):
+            if current.id == message.id:
+                del self.now_playing[guild_id]
 
     async def error_handler(self, ctx, error):
         if "opus" in str(error).lower() or "ffmpeg" in str(error).lower():
@@ -258,86 +650,79 @@ class MusicPlayer:
         else:
             await ctx.send(f"❌ Error: {str(error)}")
 
-    async def process_playlist_tracks(self, ctx, tracks, start_index=3):
+    async def resolve_playlist_item(self, guild_id, item):
+        """Resolve a Spotify playlist item to a song, or None if YouTube has no match"""
+        song = Track.create(spotify=item['track'])
+        if LAZY_PLAYLISTS:
+            return song
+
+        video = await self.resolve_spotify_track(guild_id, song)
+        if not video:
+            return None
+        song.set_stream(video)
+        return song
+
+    async def process_playlist_tracks(self, ctx, tracks, start_index=3, loading_status_msg=None):
         """Process the rest of the playlist songs in the background with rate limiting"""
         guild_id = ctx.guild.id
         if guild_id not in self.loading_playlists:
             return
 
         queue = self.get_queue(guild_id)
-        loading_status_msg = await ctx.send("⏳ Loading playlist tracks in background...")
-        
-        loaded_count = 0
-        total_tracks = len(tracks['items']) - start_index
-        
-        for i, item in enumerate(tracks['items'][start_index:]):
-            if guild_id not in self.loading_playlists:
-                break
-
-            if not item['track']:
-                continue
-                
-            # Aplicar rate limiting para evitar sobrecarga
-            if i > 0 and i % 5 == 0:  # Actualizar cada 5 canciones
-                try:
-                    await loading_status_msg.edit(content=f"⏳ Loading playlist: {i}/{total_tracks} tracks loaded...")
-                    await asyncio.sleep(2)  # Pequeña pausa para no sobrecargar la API
-                except:
-                    pass
-                
-            track = item['track']
-            search_query = f"{track['name']} {track['artists'][0]['name']}"
-            
-            try:
-                # Usar opciones de yt-dlp específicas del servidor si existen
-                ydl_opts_server = self.guild_ydl_opts.get(guild_id, ydl_opts)
-                
-                temp_ydl = yt_dlp.YoutubeDL(ydl_opts_server)
-                info = await asyncio.get_event_loop().run_in_executor(
-                    None, 
-                    lambda: temp_ydl.extract_info(f"ytsearch:{search_query}", download=False)
-                )
-                
-                if not info.get('entries'):
-                    continue
-                    
-                video = info['entries'][0]
-                song_info = {
-                    'url': video['url'],
-                    'title': video['title'],
-                    'thumbnail': video.get('thumbnail'),
-                    'duration': video.get('duration', 0),
-                    'webpage_url': video.get('webpage_url', '')
-                }
-                
-                queue.append(song_info)
-                loaded_count += 1
+        total_tracks = tracks.get('total', len(tracks['items'])) - start_index
+        if loading_status_msg is None:
+            loading_status_msg = await ctx.send("⏳ Loading playlist tracks in background...")
+        else:
+            self.updater.edit(loading_status_msg, content="⏳ Loading playlist tracks in background...")
 
-            except Exception as e:
-                print(f"Error adding track {search_query}: {e}")
-                continue
+        def on_progress(pipeline):
+            self.updater.edit(
+                loading_status_msg,
+                content=f"⏳ Loading playlist: {pipeline.loaded}/{total_tracks} tracks loaded..."
+            )
 
-        if guild_id in self.loading_playlists:
-            self.loading_playlists.remove(guild_id)
-            
+        # Las búsquedas van en paralelo (limitadas), pero la cola conserva el orden de la playlist
+        pipeline = PlaylistPipeline(
+            lambda item: self.resolve_playlist_item(guild_id, item),
+            queue.append,
+            rate=None if LAZY_PLAYLISTS else PLAYLIST_RATE,
+            should_continue=lambda: guild_id in self.loading_playlists,
+            on_progress=on_progress,
+        )
         try:
-            await loading_status_msg.edit(content=f"✅ Playlist loading complete! Added {loaded_count} tracks.")
-        except:
-            pass
+            stats = await pipeline.run(self.spotify.iter_items(tracks, start_index))
+        except Exception as e:
+            print(f"Error loading playlist pages: {e}")
+            stats = pipeline.stats()
+        mappings = self.mappings.stats()
+        print(
+            f"Playlist for guild {guild_id}: {stats['loaded']} loaded, {stats['failed']} failed, "
+            f"{stats['tracks_per_sec']:.2f} tracks/s; mapping index {mappings['hit_rate']:.0%} hits, "
+            f"{mappings['saved_seconds']:.1f}s of searching saved"
+        )
+
+        self.loading_playlists.discard(guild_id)
+        total_minutes = sum(song.duration for song in queue) // 60
+        self.updater.edit(
+            loading_status_msg,
+            content=f"✅ Playlist loading complete! Added {stats['loaded']} tracks ({total_minutes} minutes in queue)."
+        )
 
     async def add_spotify_playlist(self, ctx, playlist_url):
         try:
             playlist_id = playlist_url.split('/')[-1].split('?')[0]
-            playlist = sp.playlist(playlist_id)
-            tracks = sp.playlist_tracks(playlist_id)
+            playlist = await self.spotify.playlist(playlist_id)
+            tracks = playlist['tracks']  # Primera página; el resto se pide mientras se cargan
             
             # Create confirmation embed
+            duration_minutes = sum(track['track']['duration_ms'] for track in tracks['items'] if track.get('track')) // 60000
+            more = "+" if tracks.get('next') else ""
             formatted_date = datetime.utcnow().strftime("%d/%m/%Y %H:%M")
             embed = discord.Embed(
                 title="📌 **PLAYLIST ADDED** 🎶",
                 description=(
-                    f"The playlist `{playlist['name']}` contains `{len(tracks['items'])}` songs 🎶\n\n"
-                    f"Total duration: `{sum(track['track']['duration_ms'] for track in tracks['items'] if track.get('track')) // 60000} minutes`\n"
+                    f"The playlist `{playlist['name']}` contains `{tracks.get('total', len(tracks['items']))}` songs 🎶\n\n"
+                    f"Total duration: `{duration_minutes}{more} minutes`\n"
                     f"Added by: `{ctx.author.name}` • {formatted_date} UTC"
                 ),
                 color=discord.Color.green()
@@ -352,41 +737,24 @@ class MusicPlayer:
             loading_msg = await ctx.send("⏳ Loading first songs...")
             queue = self.get_queue(ctx.guild.id)
             
-            # Usar opciones de yt-dlp específicas del servidor si existen
             guild_id = ctx.guild.id
-            ydl_opts_server = self.guild_ydl_opts.get(guild_id, ydl_opts)
-            temp_ydl = yt_dlp.YoutubeDL(ydl_opts_server)
-            
-            initial_tracks = [item for item in tracks['items'][:5] if item.get('track')][:3]
-            for item in initial_tracks:
-                track = item['track']
-                search_query = f"{track['name']} {track['artists'][0]['name']}"
-                
-                try:
-                    info = await asyncio.get_event_loop().run_in_executor(
-                        None,
-                        lambda: temp_ydl.extract_info(f"ytsearch:{search_query}", download=False)
-                    )
-                    
-                    if not info.get('entries'):
-                        continue
-                        
-                    video = info['entries'][0]
-                    song_info = {
-                        'url': video['url'],
-                        'webpage_url': video['webpage_url'],  # YouTube page URL
-                        'title': video['title'],
-                        'thumbnail': video.get('thumbnail'),
-                        'duration': video.get('duration', 0)
-                    }
-                    
-                    queue.append(song_info)
+            start_index = 0
+            initial_tracks = []
+            for start_index, item in enumerate(tracks['items'][:5], 1):
+                if item.get('track'):
+                    initial_tracks.append(item)
+                if len(initial_tracks) == 3:
+                    break
 
-                except Exception as e:
-                    print(f"Error adding initial track {search_query}: {e}")
-                    continue
-
-            await loading_msg.delete()
+            results = await asyncio.gather(
+                *(self.resolve_playlist_item(guild_id, item) for item in initial_tracks),
+                return_exceptions=True
+            )
+            for item, song_info in zip(initial_tracks, results):
+                if isinstance(song_info, Exception):
+                    print(f"Error adding initial track {item['track']['name']}: {song_info}")
+                elif song_info:
+                    queue.append(song_info)
 
             # Reiniciar el timer de inactividad
             self.reset_inactivity_timer(guild_id)
@@ -397,7 +765,7 @@ class MusicPlayer:
 
             # Load the rest of the playlist in the background
             self.loading_playlists.add(guild_id)
-            self.bot.loop.create_task(self.process_playlist_tracks(ctx, tracks))
+            self.bot.loop.create_task(self.process_playlist_tracks(ctx, tracks, start_index, loading_msg))
 
         except Exception as e:
             await ctx.send(f"❌ Error loading playlist: {str(e)}")
@@ -405,32 +773,15 @@ class MusicPlayer:
     async def add_spotify_track(self, ctx, track_url):
         try:
             track_id = track_url.split('/')[-1].split('?')[0]
-            track = sp.track(track_id)
+            track = await self.spotify.track(track_id)
+            song_info = Track.create(spotify=track)
             
-            search_query = f"{track['name']} {track['artists'][0]['name']}"
-            
-            # Usar opciones de yt-dlp específicas del servidor si existen
             guild_id = ctx.guild.id
-            ydl_opts_server = self.guild_ydl_opts.get(guild_id, ydl_opts)
-            temp_ydl = yt_dlp.YoutubeDL(ydl_opts_server)
-            
-            info = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: temp_ydl.extract_info(f"ytsearch:{search_query}", download=False)
-            )
-            
-            if not info.get('entries'):
+            video = await self.resolve_spotify_track(guild_id, song_info)
+            if not video:
                 await ctx.send("❌ Song not found")
                 return
-                
-            video = info['entries'][0]
-            song_info = {
-                'url': video['url'],
-                'webpage_url': video['webpage_url'],  # YouTube URL
-                'title': f"{track['name']} - {track['artists'][0]['name']}",
-                'thumbnail': track['album']['images'][0]['url'] if track['album']['images'] else None,
-                'duration': track['duration_ms'] // 1000
-            }
+            song_info.set_stream(video)
             
             queue = self.get_queue(ctx.guild.id)
             queue.append(song_info)
@@ -441,7 +792,7 @@ class MusicPlayer:
             if not ctx.voice_client.is_playing():
                 await self.play_next(ctx)
             else:
-                await ctx.send(f"🎵 Added to queue: **{song_info['title']}**")
+                await ctx.send(f"🎵 Added to queue: **{song_info.title}**")
 
         except Exception as e:
             await ctx.send(f"❌ Error loading song: {str(e)}")
@@ -450,6 +801,59 @@ class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.music_player = MusicPlayer(bot)
+        self.resumed = False
+        self.loop_lag = LoopLagMonitor()
+        self.metrics_server = MetricsServer() if METRICS_PORT else None
+        self.profiler = SamplingProfiler()
+
+    async def cog_load(self):
+        self.music_player.buttons = MusicButtons(self.music_player)
+        self.bot.add_view(self.music_player.buttons)
+        REGISTRY.add_collector(self.music_player.collect_metrics)
+        self.loop_lag.start()
+        if self.metrics_server:
+            await self.metrics_server.start()
+        self.music_player.ffmpeg.start()
+        self.music_player.quality.start()
+        if self.music_player.audio_cache:
+            # Recorrer el directorio (y migrar el formato antiguo) no retrasa la conexión al gateway
+            self.bot.loop.create_task(self.music_player.audio_cache.load())
+        if not self.music_player.spotify.configured:
+            print("SPOTIFY_CLIENT_ID/SPOTIFY_CLIENT_SECRET not set: Spotify links will be rejected")
+        self.music_player.state.start()
+
+    async def cog_unload(self):
+        # Guardar la posición actual de todo lo que suena antes de cerrar
+        for guild_id in self.music_player.playing:
+            self.music_player.state.mark_dirty(guild_id)
+        await self.music_player.state.stop()
+        self.music_player.extractor.shutdown()
+        self.music_player.inactivity.stop()
+        self.music_player.mappings.close()
+        self.music_player.resolution_cache.close()
+        if self.music_player.audio_cache:
+            self.music_player.audio_cache.close()
+        for guild_player in self.music_player.guild_players.values():
+            guild_player.cancel()
+        self.music_player.ffmpeg.stop()
+        self.music_player.quality.stop()
+        self.music_player.buttons.stop()
+        await self.music_player.updater.flush()
+        await self.music_player.spotify.close()
+        REGISTRY.remove_collector(self.music_player.collect_metrics)
+        self.loop_lag.stop()
+        self.profiler.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready se repite en cada reconexión; reanudar solo la primera vez
+        if not self.resumed:
+            self.resumed = True
+            # Ya conectado: importar yt-dlp en segundo plano antes de la primera búsqueda
+            self.music_player.extractor.warm()
+            await self.music_player.resume_all()
 
     async def ensure_voice_state(self, ctx):
         """Verifica y maneja el estado de la conexión de voz"""
@@ -472,6 +876,9 @@ class Music(commands.Cog):
         if not await self.ensure_voice_state(ctx):
             return
 
+        if not ctx.voice_client.is_playing() and not ctx.voice_client.is_paused():
+            self.music_player.requested_at[ctx.guild.id] = time.perf_counter()
+
         try:
             if 'spotify.com' in query:
                 if 'playlist' in query:
@@ -481,37 +888,12 @@ class Music(commands.Cog):
                 return
 
             # YouTube or direct search
-            # Usar opciones de yt-dlp específicas del servidor si existen
-            guild_id = ctx.guild.id
-            ydl_opts_server = self.music_player.guild_ydl_opts.get(guild_id, ydl_opts)
-            temp_ydl = yt_dlp.YoutubeDL(ydl_opts_server)
-
-            # If it's a direct YouTube URL, extract the information directly
-            if 'youtube.com' in query or 'youtu.be' in query:
-                info = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: temp_ydl.extract_info(query, download=False)
-                )
-                video = info  # The info is already of the video directly
-            else:
-                # If it's a search, keep the current behavior
-                info = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: temp_ydl.extract_info(f"ytsearch:{query}", download=False)
-                )
-                if not info.get('entries'):
-                    await ctx.send("❌ Song not found")
-                    return
-                video = info['entries'][0]
-
-            # Create song_info consistently
-            song_info = {
-                'url': video.get('url', video.get('formats', [{}])[0].get('url')),
-                'webpage_url': video.get('webpage_url', ''),
-                'title': video.get('title', 'Unknown Title'),
-                'thumbnail': video.get('thumbnail', None),
-                'duration': video.get('duration', 0)
-            }
+            video = await self.music_player.extract(ctx.guild.id, query)
+            if not video:
+                await ctx.send("❌ Song not found")
+                return
+
+            song_info = Track.create(video)
             
             queue = self.music_player.get_queue(ctx.guild.id)
             queue.append(song_info)
@@ -522,38 +904,192 @@ class Music(commands.Cog):
             if not ctx.voice_client.is_playing():
                 await self.music_player.play_next(ctx)
             else:
-                await ctx.send(f"🎵 Added to queue: **{song_info['title']}**")
+                await ctx.send(f"🎵 Added to queue: **{song_info.title}**")
 
         except Exception as e:
             print(f"Error in play command: {e}")  # For debugging
             await self.music_player.error_handler(ctx, e)
 
     @commands.command(name='queue', aliases=['q'])
-    async def queue(self, ctx):
+    async def queue(self, ctx, page: int = 1):
         """Display the current music queue"""
         queue = self.music_player.get_queue(ctx.guild.id)
         
         if not queue:
             await ctx.send("Queue is empty")
             return
+
+        pages = (len(queue) + QUEUE_PAGE_SIZE - 1) // QUEUE_PAGE_SIZE
+        page = max(1, min(page, pages))
+        start = (page - 1) * QUEUE_PAGE_SIZE
             
         embed = discord.Embed(
             title="📜 Music Queue",
             color=discord.Color.blue()
         )
         
-        for i, song in enumerate(queue, 1):
-            if i <= 10:
-                embed.add_field(
-                    name=f"{i}. {song['title']}",
-                    value="\u200b",
-                    inline=False
-                )
+        for i, song in enumerate(queue.slice(start, start + QUEUE_PAGE_SIZE), start + 1):
+            embed.add_field(
+                name=f"{i}. {song.title}",
+                value="\u200b",
+                inline=False
+            )
                 
-        if len(queue) > 10:
-            embed.set_footer(text=f"And {len(queue) - 10} more songs...")
+        if pages > 1:
+            embed.set_footer(text=f"Page {page}/{pages} • {len(queue)} songs • !queue <page>")
             
         await ctx.send(embed=embed)
 
+    async def check_position(self, ctx, queue, *positions):
+        """Valida posiciones 1-based de la cola"""
+        if all(1 <= position <= len(queue) for position in positions):
+            return True
+        await ctx.send(f"❌ Position must be between 1 and {len(queue)}" if queue else "Queue is empty")
+        return False
+
+    @commands.command(name='remove', aliases=['rm'])
+    async def remove(self, ctx, position: int):
+        """Remove a song from the queue by its position"""
+        queue = self.music_player.get_queue(ctx.guild.id)
+        if not await self.check_position(ctx, queue, position):
+            return
+        song = queue.remove(position - 1)
+        await ctx.send(f"🗑️ Removed from queue: **{song.title}**")
+
+    @commands.command(name='move', aliases=['mv'])
+    async def move(self, ctx, source: int, destination: int):
+        """Move a song to another position in the queue"""
+        queue = self.music_player.get_queue(ctx.guild.id)
+        if not await self.check_position(ctx, queue, source, destination):
+            return
+        song = queue.move(source - 1, destination - 1)
+        await ctx.send(f"↕️ Moved **{song.title}** to position {destination}")
+
+    @commands.command(name='jump', aliases=['skipto'])
+    async def jump(self, ctx, position: int):
+        """Skip straight to a song in the queue"""
+        queue = self.music_player.get_queue(ctx.guild.id)
+        if not await self.check_position(ctx, queue, position):
+            return
+        queue.jump(position - 1)
+        await ctx.send(f"⏩ Jumping to **{queue[0].title}**")
+
+        vc = ctx.voice_client
+        if vc and (vc.is_playing() or vc.is_paused()):
+            vc.stop()  # after_playing arranca la nueva cabeza de la cola
+        elif vc:
+            await self.music_player.play_next(ctx)
+
+    @commands.command(name='shuffle')
+    async def shuffle(self, ctx):
+        """Shuffle the queue"""
+        queue = self.music_player.get_queue(ctx.guild.id)
+        if not queue:
+            await ctx.send("Queue is empty")
+            return
+        queue.shuffle()
+        await ctx.send(f"🔀 Shuffled {len(queue)} songs")
+
+    @commands.command(name='dedup')
+    async def dedup(self, ctx):
+        """Remove duplicate songs from the queue"""
+        queue = self.music_player.get_queue(ctx.guild.id)
+        removed = queue.dedup()
+        await ctx.send(f"🧹 Removed {removed} duplicate songs" if removed else "No duplicates in queue")
+
+    @commands.command(name='profile')
+    async def profile(self, ctx, name: str = None):
+        """Show or change the FFmpeg audio profile used in this server"""
+        guild_id = ctx.guild.id
+        current = self.music_player.guild_ffmpeg_options.get(guild_id, 'default')
+        if name is None:
+            await ctx.send(f"🎛️ Audio profile: `{current}` (available: {', '.join(FFMPEG_PROFILES)})")
+            return
+        if name not in FFMPEG_PROFILES:
+            await ctx.send(f"❌ Unknown profile. Available: {', '.join(FFMPEG_PROFILES)}")
+            return
+        self.music_player.guild_ffmpeg_options[guild_id] = name
+        self.music_player.state.mark_dirty(guild_id)
+        await ctx.send(f"🎛️ Audio profile set to `{name}` (applies from the next song)")
+
+    @commands.command(name='stats')
+    async def stats(self, ctx):
+        """Show playback latency, cache and resource statistics"""
+        player = self.music_player
+        ms = 1000
+        ffmpeg = player.ffmpeg.stats()
+        extractor = player.extractor.stats()
+        quality = player.quality.stats()
+
+        states = Counter(guild_player.state for guild_player in player.guild_players.values())
+
+        embed = discord.Embed(title="📊 Bot Stats", color=discord.Color.blurple())
+        embed.add_field(
+            name="Playback",
+            value=(
+                f"Voice clients: {len(self.bot.voice_clients)}\n"
+                f"Players: {', '.join(f'{count} {state}' for state, count in states.items()) or 'none'}\n"
+                f"Tracks played: {TRACKS_PLAYED.value()} • errors: {PLAYBACK_ERRORS.value()}\n"
+                f"First audio p50/p99: {FIRST_AUDIO_SECONDS.quantile(0.5) * ms:.0f}/{FIRST_AUDIO_SECONDS.quantile(0.99) * ms:.0f} ms\n"
+                f"Transition gap p50/p99: {TRANSITION_GAP_SECONDS.quantile(0.5) * ms:.0f}/{TRANSITION_GAP_SECONDS.quantile(0.99) * ms:.0f} ms\n"
+                f"Warm starts: {PREFETCH_WARM_STARTS.value(result='hit')} • cold: {PREFETCH_WARM_STARTS.value(result='miss')}\n"
+                f"Send jitter p99: {VOICE_JITTER_SECONDS.quantile(0.99) * ms:.1f} ms"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="Workers",
+            value=(
+                f"Event loop lag p99: {LOOP_LAG_SECONDS.quantile(0.99) * ms:.0f} ms\n"
+                f"Extraction p50/p99: {extractor['run_p50']:.2f}/{extractor['run_p99']:.2f} s ({extractor['in_flight']} in flight)\n"
+                f"FFmpeg: {ffmpeg['live']} live, {ffmpeg['spares']} spare, {ffmpeg['downloads']} downloading / {ffmpeg['max_processes']} "
+                f"({ffmpeg['cpu_seconds'] + ffmpeg['finished_cpu_seconds']:.0f} CPU s)\n"
+                f"Quality: {', '.join(f'{count} {tier}' for tier, count in quality['guilds'].items() if count) or 'none'} "
+                f"(host CPU {quality['load']:.0%}, {quality['changes']} changes)"
+            ),
+            inline=False
+        )
+        caches = [
+            ("Resolver", player.resolution_cache.stats()),
+            ("Mapping", player.mappings.stats()),
+            ("Spotify", player.spotify.stats()),
+        ]
+        if player.audio_cache:
+            store = player.audio_cache.stats()
+            caches.append(("Audio", store))
+            embed.add_field(
+                name="Audio store",
+                value=(
+                    f"{store['entries']} songs in {store['objects']} files, "
+                    f"{store['bytes'] / 1024 / 1024:.0f}/{store['max_bytes'] / 1024 / 1024:.0f} MB ({store['usage']:.0%})\n"
+                    f"{store['pending']} downloading • {store['verifying']} verifying • {store['evicted']} evicted • "
+                    f"{store['deduplicated']} deduplicated • {store['corrupt']} corrupt"
+                ),
+                inline=False
+            )
+        embed.add_field(
+            name="Cache hit rates",
+            value=" • ".join(f"{name} {stats['hit_rate']:.0%}" for name, stats in caches),
+            inline=False
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='profiler')
+    @commands.is_owner()
+    async def profiler_command(self, ctx, action: str = 'status'):
+        """Start or stop the sampling profiler on the event loop thread (bot owner only)"""
+        if action == 'start':
+            self.profiler.start()
+            await ctx.send(f"🔬 Profiler started (sampling every {self.profiler.interval * 1000:.0f} ms)")
+        elif action == 'stop':
+            self.profiler.stop()
+            path = f"profile-{int(time.time())}.txt"
+            self.profiler.dump(path)
+            top = "\n".join(f"{share:6.1%}  {name}" for name, share in self.profiler.top())
+            await ctx.send(f"🔬 {self.profiler.samples} samples, collapsed stacks in `{path}`\n```\n{top or 'no samples'}\n```")
+        else:
+            state = "running" if self.profiler.running else "stopped"
+            await ctx.send(f"🔬 Profiler is {state}. Use `!profiler start` or `!profiler stop`")
+
 async def setup(bot):
     await bot.add_cog(Music(bot))
\ No newline at end of file
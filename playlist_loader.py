@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+
+PLAYLIST_CONCURRENCY = int(os.getenv("PLAYLIST_CONCURRENCY", "4"))
+PLAYLIST_RATE = float(os.getenv("PLAYLIST_RATE", "5"))  # búsquedas por segundo
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PlaylistPipeline:
+    """Resolve playlist items with bounded concurrency, releasing results in order.
+
+    ``resolve(item)`` returns a song or None; ``on_result(song)`` is called
+    for each resolved song in playlist order as soon as every earlier item
+    has finished, so the queue keeps the playlist's order while it fills.
+    """
+
+    def __init__(self, resolve, on_result, concurrency=PLAYLIST_CONCURRENCY, rate=PLAYLIST_RATE,
+                 should_continue=lambda: True, on_progress=None):
+        self.resolve = resolve
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate) if rate else None  # sin límite si no hay búsquedas
+        self.should_continue = should_continue
+        self.on_progress = on_progress
+        self.results = {}
+        self.next_index = 0
+        self.total = 0
+        self.loaded = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+
+    async def run(self, items):
+        """Consume the async iterator ``items`` until it is exhausted or cancelled"""
+        self.started_at = time.monotonic()
+        pending = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(pending)) for _ in range(self.concurrency)]
+        try:
+            async for item in items:
+                if not self.should_continue():
+                    break
+                if not item.get('track'):
+                    continue
+                await pending.put((self.total, item))
+                self.total += 1
+        finally:
+            for _ in workers:
+                await pending.put(None)
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.finished_at = time.monotonic()
+        return self.stats()
+
+    async def _worker(self, pending):
+        while True:
+            job = await pending.get()
+            if job is None:
+                return
+            index, item = job
+            song = None
+            if self.should_continue():
+                if self.bucket:
+                    await self.bucket.acquire()
+                try:
+                    song = await self.resolve(item)
+                except Exception as e:
+                    print(f"Error adding track {item['track'].get('name')}: {e}")
+                if song is None:
+                    self.failed += 1
+            self._release(index, song)
+
+    def _release(self, index, song):
+        self.results[index] = song
+        while self.next_index in self.results:
+            ready = self.results.pop(self.next_index)
+            self.next_index += 1
+            if ready is not None and self.should_continue():
+                self.on_result(ready)
+                self.loaded += 1
+                if self.on_progress and self.loaded % 5 == 0:
+                    self.on_progress(self)
+
+    def stats(self):
+        elapsed = (self.finished_at or time.monotonic()) - (self.started_at or time.monotonic())
+        done = self.loaded + self.failed
+        return {
+            'total': self.total,
+            'loaded': self.loaded,
+            'failed': self.failed,
+            'elapsed': elapsed,
+            'tracks_per_sec': done / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+
+from metrics import PREFETCH_WARM_STARTS
+
+PREFETCH_LOOKAHEAD = int(os.getenv("PREFETCH_LOOKAHEAD", "3"))
+PREFETCH_WARM_SECONDS = float(os.getenv("PREFETCH_WARM_SECONDS", "10"))
+
+
+class Prefetcher:
+    """Keeps the head of one guild's queue ready to play.
+
+    While a track plays, the next ``lookahead`` queue entries get their
+    stream URLs refreshed, and ``warm_seconds`` before the track ends the
+    FFmpeg source for the next entry is spawned so ``play_next`` can start
+    it without waiting for FFmpeg to connect.
+    """
+
+    def __init__(self, player, guild_id, lookahead=PREFETCH_LOOKAHEAD, warm_seconds=PREFETCH_WARM_SECONDS):
+        self.player = player
+        self.guild_id = guild_id
+        self.lookahead = lookahead
+        self.warm_seconds = warm_seconds
+        self.task = None
+        self.warm_song = None
+        self.warm_source = None
+        self.track_ended_at = None
+
+    def take(self, song):
+        """Return the pre-spawned source for ``song``, if there is one"""
+        if self.warm_song is song and self.warm_source is not None and not self.warm_source.reclaimed:
+            source = self.warm_source
+            self.warm_song = self.warm_source = None
+            PREFETCH_WARM_STARTS.inc(result='hit')
+            self.player.ffmpeg.promote(source)
+            return source
+        PREFETCH_WARM_STARTS.inc(result='miss')
+        self.discard_warm()
+        return None
+
+    def discard_warm(self):
+        if self.warm_source is not None:
+            self.warm_source.cleanup()
+        self.warm_song = self.warm_source = None
+
+    def track_ended(self):
+        """Called from the audio thread when a track finishes"""
+        self.track_ended_at = time.perf_counter()
+
+    def track_started(self, song, vc):
+        """Start prefetching for the new track"""
+        self.track_ended_at = None  # El hueco ya lo mide on_first_packet en musicbot_transition_gap_seconds
+
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.task = self.player.bot.loop.create_task(self.run(song, vc))
+
+    async def run(self, song, vc):
+        try:
+            queue = self.player.get_queue(self.guild_id)
+            for upcoming in queue.slice(0, self.lookahead):
+                try:
+                    await self.player.refresh_stream_url(self.guild_id, upcoming)
+                except Exception as e:
+                    print(f"Error prefetching {upcoming.title}: {e}")
+
+            # Contar solo el tiempo en que realmente suena (las pausas no cuentan)
+            remaining = song.duration - self.warm_seconds
+            while remaining > 0:
+                await asyncio.sleep(1)
+                if not vc.is_connected():
+                    return
+                if vc.is_playing():
+                    remaining -= 1
+
+            self.discard_warm()
+            if not queue or not self.player.ffmpeg.can_warm():
+                return  # Sin hueco para un proceso de reserva: play_next lo lanzará al empezar
+            upcoming = queue[0]
+            upcoming = await self.player.refresh_stream_url(self.guild_id, upcoming)
+            self.warm_song = upcoming
+            self.warm_source = self.player.build_source(self.guild_id, upcoming, spare=True)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Error warming the next song: {e}")
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.discard_warm()
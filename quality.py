@@ -0,0 +1,153 @@
+import asyncio
+import os
+
+from metrics import QUALITY_CHANGES
+
+ADAPTIVE_QUALITY = os.getenv("ADAPTIVE_QUALITY", "1") != "0"
+QUALITY_MEDIUM_LOAD = float(os.getenv("QUALITY_MEDIUM_LOAD", "0.6"))
+QUALITY_LOW_LOAD = float(os.getenv("QUALITY_LOW_LOAD", "0.85"))
+QUALITY_SAMPLE_SECONDS = float(os.getenv("QUALITY_SAMPLE_SECONDS", "5"))
+
+# De mejor a peor. 'bitrate' en kbps (máximo: el canal puede bajarlo); 'encoder' son opciones de
+# libopus cuando FFmpeg codifica (None: FFmpeg entrega PCM y discord.py codifica, como siempre)
+QUALITY_TIERS = {
+    'high': {
+        'bitrate': 128,
+        'format': 'bestaudio[acodec=opus][asr=48000]/bestaudio/best',
+        'encoder': None,
+    },
+    'medium': {
+        'bitrate': 96,
+        'format': 'bestaudio[acodec=opus][asr=48000][abr<=100]/bestaudio[abr<=128]/bestaudio/best',
+        'encoder': '-compression_level 6',
+    },
+    'low': {
+        'bitrate': 64,
+        'format': 'worstaudio[acodec=opus][asr=48000]/bestaudio[abr<=64]/worstaudio/best',
+        'encoder': '-compression_level 2',
+    },
+}
+TIER_ORDER = list(QUALITY_TIERS)
+
+
+def read_cpu_times():
+    """(busy, total) jiffies of all CPUs from /proc/stat, or None where it is unavailable"""
+    try:
+        with open("/proc/stat") as f:
+            fields = [int(value) for value in f.readline().split()[1:9]]
+    except (OSError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    total = sum(fields)
+    return total - idle, total
+
+
+class HostLoad:
+    """Host CPU utilisation (0.0-1.0 across all cores), sampled every ``interval`` seconds"""
+
+    def __init__(self, interval=QUALITY_SAMPLE_SECONDS):
+        self.interval = interval
+        self.load = 0.0
+        self.last = None
+        self.task = None
+
+    def sample(self):
+        times = read_cpu_times()
+        if times is None:
+            # Sin /proc: media de carga del último minuto por núcleo
+            if hasattr(os, 'getloadavg'):
+                self.load = min(1.0, os.getloadavg()[0] / (os.cpu_count() or 1))
+            return self.load
+        if self.last is not None:
+            busy, total = times[0] - self.last[0], times[1] - self.last[1]
+            if total > 0:
+                self.load = busy / total
+        self.last = times
+        return self.load
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+
+class QualityGovernor:
+    """Chooses each guild's quality tier from the host CPU load and its bitrate from the channel.
+
+    Both are re-evaluated only at track boundaries (``update`` is called
+    right before a track starts), so a song never changes quality while it
+    plays. Above ``medium_load`` / ``low_load`` host CPU every guild drops
+    to ``medium`` / ``low``: smaller yt-dlp formats for the next lookups and
+    cheaper libopus settings when FFmpeg has to encode. The voice channel
+    only caps the bitrate: a 64 kbps channel on an idle host keeps the
+    ``high`` format and encoder, encoded at 64 kbps.
+    """
+
+    def __init__(self, load=None, enabled=ADAPTIVE_QUALITY,
+                 medium_load=QUALITY_MEDIUM_LOAD, low_load=QUALITY_LOW_LOAD):
+        self.load = load or HostLoad()
+        self.enabled = enabled
+        self.medium_load = medium_load
+        self.low_load = low_load
+        self.tiers = {}  # guild_id -> nivel elegido en el último cambio de canción
+        self.bitrates = {}  # guild_id -> kbps del nivel, limitado por el canal
+        self.changes = 0
+
+    def tier(self, guild_id):
+        return self.tiers.get(guild_id, TIER_ORDER[0])
+
+    def choose(self, load):
+        """Tier for host ``load``: the CPU the host can spare decides formats and encoder settings"""
+        if not self.enabled or load < self.medium_load:
+            return 'high'
+        return 'low' if load >= self.low_load else 'medium'
+
+    @staticmethod
+    def cap_bitrate(tier, channel_bitrate):
+        """kbps to encode a tier at in a channel of ``channel_bitrate`` bits/s"""
+        return min(QUALITY_TIERS[tier]['bitrate'], max(channel_bitrate // 1000, 8))  # 8 kbps: mínimo de Discord
+
+    def encoding(self, guild_id):
+        """Settings of a guild's tier, with the bitrate its channel allows"""
+        tier = self.tier(guild_id)
+        return dict(QUALITY_TIERS[tier], bitrate=self.bitrates.get(guild_id, QUALITY_TIERS[tier]['bitrate']))
+
+    def update(self, guild_id, channel_bitrate):
+        """Re-evaluate a guild's tier and bitrate at a track boundary and return the tier"""
+        tier = self.choose(self.load.load)
+        if tier != self.tier(guild_id):
+            self.changes += 1
+            QUALITY_CHANGES.inc(tier=tier)
+        self.tiers[guild_id] = tier
+        self.bitrates[guild_id] = self.cap_bitrate(tier, channel_bitrate)
+        return tier
+
+    def forget(self, guild_id):
+        self.tiers.pop(guild_id, None)
+        self.bitrates.pop(guild_id, None)
+
+    def start(self):
+        if self.enabled:
+            self.load.start()
+
+    def stop(self):
+        self.load.stop()
+
+    def stats(self):
+        counts = {name: 0 for name in TIER_ORDER}
+        for tier in self.tiers.values():
+            counts[tier] += 1
+        return {
+            'enabled': self.enabled,
+            'load': self.load.load,
+            'changes': self.changes,
+            'guilds': counts,
+        }
@@ -0,0 +1,184 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+from sqlite_writer import SqliteWriter, connect_reader
+
+# Videos de YouTube: watch?v=, youtu.be/, shorts/ y music.youtube.com
+YOUTUBE_ID_RE = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+METADATA_FIELDS = ('id', 'webpage_url', 'title', 'duration', 'thumbnail', 'acodec', 'asr')
+
+
+def normalize_query(query):
+    """Normaliza una búsqueda o URL para usarla como clave de caché"""
+    match = YOUTUBE_ID_RE.search(query)
+    if match:
+        return f"yt:{match.group(1)}"
+    return "q:" + " ".join(query.lower().split())
+
+
+def stream_url_expiry(url, default_ttl=3600):
+    """Devuelve el timestamp en el que caduca una URL firmada de googlevideo"""
+    try:
+        params = parse_qs(urlparse(url).query)
+        if 'expire' in params:
+            return int(params['expire'][0])
+    except (ValueError, TypeError):
+        pass
+    return int(time.time()) + default_ttl
+
+
+class ResolutionCache:
+    """LRU cache for yt-dlp lookups with an optional sqlite tier.
+
+    Metadata is stored per video id and never expires; the signed stream
+    URL is stored next to it and is treated as missing once it is within
+    ``refresh_margin`` seconds of its ``expire=`` timestamp, so callers
+    re-resolve it before playback fails. Writes to sqlite are committed in
+    batches from a background thread.
+    """
+
+    def __init__(self, max_entries=1024, db_path=None, refresh_margin=300, default_ttl=3600):
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.aliases = OrderedDict()  # clave de búsqueda -> video id
+        self.entries = OrderedDict()  # video id -> {'metadata', 'stream_url', 'expires_at'}
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.lock = threading.Lock()
+        self.db = None
+        self.writer = None
+        if db_path:
+            self.db = connect_reader(db_path)
+            self.writer = SqliteWriter(db_path)
+            self.db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS aliases (
+                    key TEXT PRIMARY KEY,
+                    video_id TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    metadata TEXT NOT NULL,
+                    stream_url TEXT,
+                    expires_at INTEGER
+                );
+                """
+            )
+
+    def _namespaced(self, key, namespace):
+        return f"{namespace}|{key}" if namespace else key
+
+    def _touch(self, mapping, key, value):
+        mapping[key] = value
+        mapping.move_to_end(key)
+        while len(mapping) > self.max_entries:
+            mapping.popitem(last=False)
+
+    def _load(self, key):
+        """Busca una entrada en el nivel sqlite y la sube a memoria"""
+        if not self.db:
+            return None
+        row = self.db.execute("SELECT video_id FROM aliases WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        video_id = row[0]
+        row = self.db.execute(
+            "SELECT metadata, stream_url, expires_at FROM videos WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        if not row:
+            return None
+        entry = {'metadata': json.loads(row[0]), 'stream_url': row[1], 'expires_at': row[2] or 0}
+        self._touch(self.aliases, key, video_id)
+        self._touch(self.entries, video_id, entry)
+        return entry
+
+    def get(self, key, namespace=None):
+        """Return a dict with the metadata and, if still fresh, the stream ``url``"""
+        key = self._namespaced(key, namespace)
+        with self.lock:
+            video_id = self.aliases.get(key)
+            entry = self.entries.get(video_id) if video_id else None
+            if entry is None:
+                entry = self._load(key)
+            else:
+                self.aliases.move_to_end(key)
+                self.entries.move_to_end(video_id)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            result = dict(entry['metadata'])
+            if entry['stream_url'] and entry['expires_at'] - self.refresh_margin > time.time():
+                self.hits += 1
+                result['url'] = entry['stream_url']
+            else:
+                # Metadatos válidos pero la URL firmada va a caducar
+                self.stale += 1
+                result['url'] = None
+            return result
+
+    def put(self, key, video, stream_url, namespace=None):
+        """Store a resolved yt-dlp entry under ``key`` and its video id"""
+        key = self._namespaced(key, namespace)
+        metadata = {field: video.get(field) for field in METADATA_FIELDS}
+        video_id = self._namespaced(metadata['id'] or metadata['webpage_url'] or key, namespace)
+        expires_at = stream_url_expiry(stream_url, self.default_ttl) if stream_url else 0
+        entry = {'metadata': metadata, 'stream_url': stream_url, 'expires_at': expires_at}
+
+        with self.lock:
+            self._touch(self.entries, video_id, entry)
+            self._touch(self.aliases, key, video_id)
+            if metadata['id']:
+                # Un enlace directo al mismo vídeo también debe acertar
+                self._touch(self.aliases, self._namespaced(f"yt:{metadata['id']}", namespace), video_id)
+
+            if self.db:
+                aliases = [(key, video_id)]
+                if metadata['id']:
+                    aliases.append((self._namespaced(f"yt:{metadata['id']}", namespace), video_id))
+                self.writer.execute_many("INSERT OR REPLACE INTO aliases VALUES (?, ?)", aliases)
+                self.writer.execute_many(
+                    "INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?)",
+                    [(video_id, json.dumps(metadata), stream_url, expires_at)],
+                )
+
+    def needs_refresh(self, stream_url):
+        """True if a stream URL is expired or about to expire"""
+        return stream_url_expiry(stream_url, self.default_ttl) - self.refresh_margin <= time.time()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.stale
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+        }
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.db:
+            self.db.close()
+            self.db = None
+
+
+def cache_from_env():
+    """Crea la caché usando RESOLVER_CACHE_SIZE y RESOLVER_CACHE_DB si existen"""
+    return ResolutionCache(
+        max_entries=int(os.getenv("RESOLVER_CACHE_SIZE", "1024")),
+        db_path=os.getenv("RESOLVER_CACHE_DB") or None,
+    )
@@ -0,0 +1,77 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+
+class DeadlineScheduler:
+    """Per-key deadlines served by a single task that wakes once per tick.
+
+    Re-arming a key only replaces its deadline; the stale heap entry is
+    dropped when it reaches the top, and the heap is compacted when stale
+    entries pile up. Callbacks return a coroutine, which is started as a
+    task when the deadline passes.
+    """
+
+    def __init__(self, tick=1.0):
+        self.tick = tick
+        self.deadlines = {}  # clave -> (deadline, seq, callback)
+        self.heap = []  # (deadline, seq, clave)
+        self.counter = itertools.count()
+        self.task = None
+        self.running = set()  # tareas de callbacks en curso: el loop solo guarda referencias débiles
+        self.fired = 0
+
+    def arm(self, key, delay, callback):
+        """(Re)arm ``key`` to run ``callback()`` in ``delay`` seconds"""
+        deadline = time.monotonic() + delay
+        seq = next(self.counter)
+        self.deadlines[key] = (deadline, seq, callback)
+        heapq.heappush(self.heap, (deadline, seq, key))
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self._compact()
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def cancel(self, key):
+        self.deadlines.pop(key, None)
+
+    def armed(self):
+        """Number of keys with a pending deadline"""
+        return len(self.deadlines)
+
+    def _compact(self):
+        self.heap = [(deadline, seq, key) for key, (deadline, seq, _) in self.deadlines.items()]
+        heapq.heapify(self.heap)
+
+    def _fire_due(self):
+        now = time.monotonic()
+        while self.heap and self.heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self.heap)
+            entry = self.deadlines.get(key)
+            if entry is None or entry[1] != seq:
+                continue  # cancelado o rearmado después
+            del self.deadlines[key]
+            self.fired += 1
+            task = asyncio.get_running_loop().create_task(entry[2]())
+            self.running.add(task)
+            task.add_done_callback(self._callback_done)
+
+    def _callback_done(self, task):
+        self.running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error in scheduled callback: {task.exception()}")
+
+    async def _run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.tick)
+                self._fire_due()
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.deadlines.clear()
+        self.heap.clear()
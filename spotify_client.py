@@ -0,0 +1,174 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import aiohttp
+from yarl import URL
+
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+SPOTIFY_CACHE_TTL = float(os.getenv("SPOTIFY_CACHE_TTL", "600"))
+BATCH_SIZE = 50  # máximo de ids que acepta /tracks?ids=
+
+
+class SpotifyError(Exception):
+    pass
+
+
+class SpotifyClient:
+    """Async Spotify Web API client using client-credentials auth.
+
+    Responses are cached for ``ttl`` seconds; after that, a request for the
+    same URL is revalidated with ``If-None-Match`` so an unchanged playlist
+    costs a 304 instead of the full body. Track objects are also cached by
+    id, so batch lookups only ask Spotify for the ones it hasn't seen.
+    """
+
+    def __init__(self, client_id, client_secret, session=None, api_url=SPOTIFY_API_URL,
+                 token_url=SPOTIFY_TOKEN_URL, ttl=SPOTIFY_CACHE_TTL, max_entries=512):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.session = session
+        self.api_url = api_url.rstrip('/')
+        self.token_url = token_url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.access_token = None
+        self.token_expires_at = 0
+        self.token_lock = asyncio.Lock()
+        self.responses = OrderedDict()  # url -> (fetched_at, etag, data)
+        self.tracks_by_id = OrderedDict()  # id -> (fetched_at, track)
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.requests = 0
+        self.owns_session = False
+
+    @property
+    def configured(self):
+        return bool(self.client_id and self.client_secret)
+
+    def _session(self):
+        # Sin sesión propia se crea una con la primera petición, no al arrancar el bot
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self.owns_session = True
+        return self.session
+
+    async def close(self):
+        """Close the HTTP session if the client created it"""
+        if self.owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+            self.owns_session = False
+
+    async def _get_token(self):
+        async with self.token_lock:
+            if self.access_token and time.time() < self.token_expires_at - 60:
+                return self.access_token
+            if not self.configured:
+                raise SpotifyError("SPOTIFY_CLIENT_ID and SPOTIFY_CLIENT_SECRET must be set to use Spotify links")
+            auth = aiohttp.BasicAuth(self.client_id, self.client_secret)
+            async with self._session().post(self.token_url, data={'grant_type': 'client_credentials'}, auth=auth) as response:
+                if response.status != 200:
+                    raise SpotifyError(f"Spotify authentication failed ({response.status})")
+                data = await response.json()
+            self.access_token = data['access_token']
+            self.token_expires_at = time.time() + data.get('expires_in', 3600)
+            return self.access_token
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    async def get(self, path_or_url, params=None):
+        """GET an API path (or a full ``next`` URL) with caching and 429 handling"""
+        url = path_or_url if path_or_url.startswith('http') else f"{self.api_url}{path_or_url}"
+        if params:
+            url = str(URL(url).update_query(params))
+
+        cached = self.responses.get(url)
+        if cached and time.time() - cached[0] < self.ttl:
+            self.hits += 1
+            self.responses.move_to_end(url)
+            return cached[2]
+
+        for attempt in range(4):
+            headers = {'Authorization': f"Bearer {await self._get_token()}"}
+            if cached and cached[1]:
+                headers['If-None-Match'] = cached[1]
+            self.requests += 1
+            async with self._session().get(url, headers=headers) as response:
+                if response.status == 304:
+                    self.revalidated += 1
+                    self._remember(self.responses, url, (time.time(), cached[1], cached[2]))
+                    return cached[2]
+                if response.status == 429:
+                    await asyncio.sleep(float(response.headers.get('Retry-After', 1)))
+                    continue
+                if response.status == 401 and attempt == 0:
+                    self.access_token = None  # token caducado antes de tiempo
+                    continue
+                if response.status != 200:
+                    raise SpotifyError(f"Spotify request failed ({response.status}): {url}")
+                data = await response.json()
+                self.misses += 1
+                self._remember(self.responses, url, (time.time(), response.headers.get('ETag'), data))
+                return data
+        raise SpotifyError(f"Spotify request kept failing: {url}")
+
+    async def playlist(self, playlist_id):
+        """Playlist object; ``['tracks']`` holds its first page of items"""
+        return await self.get(f"/playlists/{playlist_id}")
+
+    async def iter_items(self, page, start_index=0):
+        """Yield every item of a paging object, fetching later pages on demand"""
+        while page:
+            for item in page['items'][start_index:]:
+                yield item
+            start_index = 0
+            if not page.get('next'):
+                break
+            page = await self.get(page['next'])
+
+    async def track(self, track_id):
+        return (await self.tracks([track_id]))[0]
+
+    async def tracks(self, track_ids):
+        """Track objects for ``track_ids`` in order, batching uncached ids 50 at a time"""
+        now = time.time()
+        missing = []
+        for track_id in dict.fromkeys(track_ids):
+            cached = self.tracks_by_id.get(track_id)
+            if cached and now - cached[0] < self.ttl:
+                self.hits += 1
+            else:
+                missing.append(track_id)
+
+        for start in range(0, len(missing), BATCH_SIZE):
+            batch = missing[start:start + BATCH_SIZE]
+            data = await self.get("/tracks", {'ids': ",".join(batch)})
+            for track in data['tracks']:
+                if track:
+                    self._remember(self.tracks_by_id, track['id'], (time.time(), track))
+
+        result = []
+        for track_id in track_ids:
+            cached = self.tracks_by_id.get(track_id)
+            if cached is None:
+                raise SpotifyError(f"Spotify track not found: {track_id}")
+            result.append(cached[1])
+        return result
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.revalidated
+        return {
+            'requests': self.requests,
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
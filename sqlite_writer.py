@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def connect_reader(path):
+    """Connection for lookups; WAL lets them run while another connection or process writes"""
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    return db
+
+
+class SqliteWriter:
+    """Batches writes to a sqlite file and commits them from one background thread.
+
+    Callers on the event loop only queue statements; a dedicated connection
+    applies everything queued so far in a single transaction, so commits
+    (and their fsync) and busy waits on a file shared with other processes
+    never block the loop. Writes are applied in the order they were queued.
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='sqlite-writer')
+        self.lock = threading.Lock()
+        self.pending = []  # (sql, filas)
+        self.scheduled = False
+        self.db = None  # se abre en el hilo escritor
+
+    def execute_many(self, sql, rows):
+        with self.lock:
+            self.pending.append((sql, rows))
+            if self.scheduled:
+                return  # Entra en el lote que ya está en cola
+            self.scheduled = True
+        self.executor.submit(self._flush)
+
+    def _flush(self):
+        with self.lock:
+            batch, self.pending, self.scheduled = self.pending, [], False
+        try:
+            if self.db is None:
+                self.db = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            with self.db:
+                for sql, rows in batch:
+                    self.db.executemany(sql, rows)
+        except sqlite3.Error as e:
+            print(f"Error writing to {self.path}: {e}")
+
+    def close(self):
+        """Apply every queued write, then close the connection"""
+        self.executor.shutdown(wait=True)
+        if self.db:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import sqlite3
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")  # memory, sqlite o redis
+STATE_DB = os.getenv("STATE_DB", "bot_state.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "2"))
+
+
+class MemoryBackend:
+    """Keeps snapshots in this process only (nothing survives a restart)"""
+
+    persistent = False
+
+    def __init__(self):
+        self.data = {}
+
+    async def load_all(self):
+        return {guild_id: json.loads(raw) for guild_id, raw in self.data.items()}
+
+    async def save_many(self, snapshots):
+        for guild_id, snapshot in snapshots.items():
+            self.data[guild_id] = json.dumps(snapshot)
+
+    async def delete_many(self, guild_ids):
+        for guild_id in guild_ids:
+            self.data.pop(guild_id, None)
+
+    async def close(self):
+        pass
+
+
+class SqliteBackend:
+    """One row per guild in a local sqlite file; queries run off the event loop"""
+
+    persistent = True
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS guild_state (guild_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        self.db.commit()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def load_all(self):
+        rows = await self._run(lambda: self.db.execute("SELECT guild_id, data FROM guild_state").fetchall())
+        return {guild_id: json.loads(data) for guild_id, data in rows}
+
+    def _save_many(self, rows):
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO guild_state VALUES (?, ?)", rows)
+
+    async def save_many(self, snapshots):
+        await self._run(self._save_many, [(guild_id, json.dumps(s)) for guild_id, s in snapshots.items()])
+
+    def _delete_many(self, guild_ids):
+        with self.db:
+            self.db.executemany("DELETE FROM guild_state WHERE guild_id = ?", [(g,) for g in guild_ids])
+
+    async def delete_many(self, guild_ids):
+        await self._run(self._delete_many, list(guild_ids))
+
+    async def close(self):
+        self.db.close()
+
+
+class RedisBackend:
+    """All guilds in one redis hash; ``client`` is a ``redis.asyncio.Redis`` or a compatible fake"""
+
+    persistent = True
+
+    def __init__(self, client, key="musicbot:state"):
+        self.client = client
+        self.key = key
+
+    async def load_all(self):
+        raw = await self.client.hgetall(self.key)
+        return {int(guild_id): json.loads(data) for guild_id, data in raw.items()}
+
+    async def save_many(self, snapshots):
+        # Un solo HSET para todo el lote
+        await self.client.hset(self.key, mapping={str(g): json.dumps(s) for g, s in snapshots.items()})
+
+    async def delete_many(self, guild_ids):
+        await self.client.hdel(self.key, *[str(g) for g in guild_ids])
+
+    async def close(self):
+        close = getattr(self.client, 'aclose', None)
+        if close:
+            await close()
+
+
+def backend_from_env():
+    """Crea el backend indicado por STATE_BACKEND"""
+    if STATE_BACKEND == "sqlite":
+        return SqliteBackend(STATE_DB)
+    if STATE_BACKEND == "redis":
+        import redis.asyncio
+        return RedisBackend(redis.asyncio.from_url(REDIS_URL))
+    return MemoryBackend()
+
+
+class StateStore:
+    """Write-behind persistence of per-guild player state.
+
+    Mutations only mark a guild dirty; every ``flush_interval`` seconds the
+    dirty guilds are snapshotted through ``snapshot(guild_id)`` and written
+    in one batch. A snapshot of None deletes the guild's saved state. With
+    a backend that does not outlive the process (``persistent`` False) no
+    snapshot could ever be resumed, so nothing is tracked or written.
+    """
+
+    def __init__(self, backend, snapshot, flush_interval=STATE_FLUSH_INTERVAL):
+        self.backend = backend
+        self.snapshot = snapshot
+        self.flush_interval = flush_interval
+        self.dirty = set()
+        self.task = None
+        self.flushes = 0
+        self.writes = 0
+
+    def mark_dirty(self, guild_id):
+        if self.backend.persistent:
+            self.dirty.add(guild_id)
+
+    async def load_all(self):
+        return await self.backend.load_all()
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        guild_ids, self.dirty = self.dirty, set()
+        snapshots = {}
+        deleted = []
+        for guild_id in guild_ids:
+            snapshot = self.snapshot(guild_id)
+            if snapshot is None:
+                deleted.append(guild_id)
+            else:
+                snapshots[guild_id] = snapshot
+        try:
+            if snapshots:
+                await self.backend.save_many(snapshots)
+            if deleted:
+                await self.backend.delete_many(deleted)
+            self.flushes += 1
+            self.writes += len(guild_ids)
+        except Exception as e:
+            print(f"Error saving player state: {e}")
+            self.dirty |= guild_ids  # reintentar en la próxima pasada
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if not self.backend.persistent:
+            return
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flush what is pending and stop persisting"""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        await self.flush()
+        await self.backend.close()
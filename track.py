@@ -0,0 +1,86 @@
+import sys
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Track:
+    """A queued song.
+
+    Built only through ``Track.create`` from a yt-dlp record, a Spotify
+    track object or both. A Track without ``url`` holds Spotify metadata
+    only and is resolved on YouTube when it nears the head of the queue.
+    Strings repeated across many entries (artist, artwork URL, codec) are
+    interned so large playlists share them.
+    """
+
+    __slots__ = (
+        'title', 'artist', 'duration', 'thumbnail', 'url', 'webpage_url',
+        'acodec', 'asr', 'search_query', 'spotify_id', 'isrc', 'start_offset',
+    )
+
+    def __init__(self, title, artist=None, duration=0, thumbnail=None, url=None, webpage_url=None,
+                 acodec=None, asr=None, search_query=None, spotify_id=None, isrc=None, start_offset=0):
+        self.title = title
+        self.artist = _intern(artist)
+        self.duration = duration or 0
+        self.thumbnail = _intern(thumbnail)
+        self.url = url
+        self.webpage_url = webpage_url
+        self.acodec = _intern(acodec)
+        self.asr = asr
+        self.search_query = search_query
+        self.spotify_id = spotify_id
+        self.isrc = isrc
+        self.start_offset = start_offset  # segundos a saltar al reanudar tras un reinicio
+
+    @classmethod
+    def create(cls, video=None, spotify=None):
+        """Build a Track from a yt-dlp record and/or a Spotify track object.
+
+        Spotify metadata wins for title, artwork and duration; the yt-dlp
+        record provides the stream. With only ``spotify`` the Track is lazy.
+        """
+        if spotify is not None:
+            artist = spotify['artists'][0]['name']
+            images = spotify['album']['images']
+            track = cls(
+                title=f"{spotify['name']} - {artist}",
+                artist=artist,
+                duration=spotify['duration_ms'] // 1000,
+                thumbnail=images[0]['url'] if images else None,
+                search_query=f"{spotify['name']} {artist}",
+                spotify_id=spotify.get('id'),
+                isrc=spotify.get('external_ids', {}).get('isrc'),
+            )
+        else:
+            track = cls(
+                title=video.get('title') or 'Unknown Title',
+                duration=video.get('duration'),
+                thumbnail=video.get('thumbnail'),
+            )
+        if video is not None:
+            track.set_stream(video)
+        return track
+
+    @property
+    def resolved(self):
+        return self.url is not None
+
+    def set_stream(self, video):
+        """Take the stream fields from a resolved yt-dlp record"""
+        self.url = video['url']
+        self.webpage_url = video.get('webpage_url') or None
+        self.acodec = _intern(video.get('acodec'))
+        self.asr = video.get('asr')
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data[field] for field in cls.__slots__ if field in data})
+
+    def __repr__(self):
+        return f"<Track {self.title!r} resolved={self.resolved}>"
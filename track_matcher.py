@@ -0,0 +1,183 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+from sqlite_writer import SqliteWriter, connect_reader
+
+MATCH_CANDIDATES = int(os.getenv("MATCH_CANDIDATES", "5"))
+MAPPING_DB = os.getenv("MAPPING_DB", "track_mappings.db")
+MIN_SCORE = 0.5  # por debajo no se guarda el emparejamiento y se vuelve a buscar la próxima vez
+
+# Adornos habituales en títulos de YouTube que no forman parte del nombre de la canción
+NOISE_RE = re.compile(r'[\(\[][^\)\]]*(official|video|audio|lyric|visualizer|hd|4k|mv)[^\)\]]*[\)\]]')
+# Versiones que casi nunca son la que se pidió, salvo que el título de Spotify también lo diga
+UNWANTED = ('live', 'cover', 'remix', 'karaoke', 'instrumental', 'sped up', 'slowed', 'nightcore', '8d')
+
+
+def normalize_title(title):
+    title = NOISE_RE.sub(' ', (title or '').lower())
+    return " ".join(re.sub(r'[^\w\s]', ' ', title).split())
+
+
+def title_similarity(a, b):
+    """0..1 similarity of two song titles, ignoring case, punctuation and "(Official Video)" noise"""
+    return SequenceMatcher(None, normalize_title(a), normalize_title(b)).ratio()
+
+
+def score_candidate(candidate, title, artist, duration):
+    """Score a ``ytsearchN`` entry against a Spotify track; higher is better, roughly 0..1"""
+    candidate_title = candidate.get('title') or ''
+    name = title.rsplit(' - ', 1)[0] if artist else title
+    # "Canción - Artista", "Artista - Canción" o solo "Canción" (canales "Artista - Topic")
+    similarity = max(
+        title_similarity(candidate_title, title),
+        title_similarity(candidate_title, f"{artist} - {name}"),
+        title_similarity(candidate_title, name),
+    )
+
+    # 0 segundos de diferencia puntúa 1, 30 o más puntúan 0
+    if duration and candidate.get('duration'):
+        timing = 1.0 - min(abs(candidate['duration'] - duration) / 30.0, 1.0)
+    else:
+        timing = 0.5
+
+    score = 0.6 * similarity + 0.4 * timing
+    wanted = normalize_title(title)
+    found = f" {normalize_title(candidate_title)} "
+    if any(f" {word} " in found for word in UNWANTED if word not in wanted):
+        score -= 0.3
+    channel = (candidate.get('channel') or candidate.get('uploader') or '').lower()
+    if artist and (artist.lower() in channel or channel.endswith(' - topic')):
+        score += 0.1
+    return score
+
+
+def pick_best(entries, title, artist, duration):
+    """Best-scoring entry and its score, or (None, 0.0) when there are no entries"""
+    best, best_score = None, 0.0
+    for entry in entries:
+        if not entry or not entry.get('id'):
+            continue
+        score = score_candidate(entry, title, artist, duration)
+        if best is None or score > best_score:
+            best, best_score = entry, score
+    return best, best_score
+
+
+class MappingIndex:
+    """Spotify track id / ISRC -> YouTube video id, filled in on first resolution.
+
+    A track that was matched once skips the YouTube search next time, even
+    when it reaches the bot through a different playlist or a re-release
+    sharing its ISRC. Lookups are timed so ``stats()`` can report how much
+    resolution time the index saves compared to searching. Writes to sqlite
+    are committed in batches from a background thread.
+    """
+
+    def __init__(self, max_entries=10000, db_path=None):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # "spotify:<id>" / "isrc:<isrc>" -> video id
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        self.lock = threading.Lock()
+        self.db = None
+        self.writer = None
+        if db_path:
+            self.db = connect_reader(db_path)
+            self.writer = SqliteWriter(db_path)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS mappings (key TEXT PRIMARY KEY, video_id TEXT NOT NULL, score REAL)"
+            )
+            self.db.commit()
+
+    @staticmethod
+    def keys_for(spotify_id, isrc):
+        keys = []
+        if spotify_id:
+            keys.append(f"spotify:{spotify_id}")
+        if isrc:
+            keys.append(f"isrc:{isrc.upper()}")
+        return keys
+
+    def _touch(self, key, video_id):
+        self.entries[key] = video_id
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, spotify_id, isrc):
+        """Mapped video id for a Spotify track, or None"""
+        with self.lock:
+            for key in self.keys_for(spotify_id, isrc):
+                video_id = self.entries.get(key)
+                if video_id is None and self.db:
+                    row = self.db.execute("SELECT video_id FROM mappings WHERE key = ?", (key,)).fetchone()
+                    video_id = row[0] if row else None
+                if video_id:
+                    self._touch(key, video_id)
+                    return video_id
+            return None
+
+    def put(self, spotify_id, isrc, video_id, score=None):
+        keys = self.keys_for(spotify_id, isrc)
+        with self.lock:
+            for key in keys:
+                self._touch(key, video_id)
+            if self.writer and keys:
+                self.writer.execute_many(
+                    "INSERT OR REPLACE INTO mappings VALUES (?, ?, ?)", [(key, video_id, score) for key in keys]
+                )
+
+    def forget(self, spotify_id, isrc):
+        """Drop a mapping whose video is gone, so the track is searched again"""
+        keys = self.keys_for(spotify_id, isrc)
+        with self.lock:
+            for key in keys:
+                if self.writer:
+                    # Marca vacía: que get() no lea de sqlite la fila que el DELETE aún no ha borrado
+                    self._touch(key, '')
+                else:
+                    self.entries.pop(key, None)
+            if self.writer and keys:
+                self.writer.execute_many("DELETE FROM mappings WHERE key = ?", [(key,) for key in keys])
+
+    def record(self, hit, seconds):
+        """Account one resolution that did (hit) or did not use the index"""
+        if hit:
+            self.hits += 1
+            self.hit_seconds += seconds
+        else:
+            self.misses += 1
+            self.miss_seconds += seconds
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        avg_hit = self.hit_seconds / self.hits if self.hits else 0.0
+        avg_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'avg_hit_seconds': avg_hit,
+            'avg_search_seconds': avg_miss,
+            # Lo que habrían costado los aciertos si se hubieran buscado
+            'saved_seconds': max(0.0, avg_miss - avg_hit) * self.hits if self.misses else 0.0,
+            'entries': len(self.entries),
+        }
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.db:
+            self.db.close()
+            self.db = None
+
+
+def mapping_index_from_env():
+    """Crea el índice usando MAPPING_DB ("" lo deja solo en memoria)"""
+    return MappingIndex(db_path=MAPPING_DB or None)